@@ -5,18 +5,62 @@ def register_blueprints(app: Flask) -> None:
     """注册蓝图"""
     from app.api.spider import spider_api
     from app.api.user import user
+    from app.api.profile import profile_api
+    from app.api.batch import batch_api
     
     app.register_blueprint(spider_api)
+    app.register_blueprint(batch_api)
     app.register_blueprint(user, url_prefix='/api/user')
+    app.register_blueprint(profile_api, url_prefix='/api/profiles')
 
 
 def register_plugins(app: Flask) -> None:
     """注册flask插件"""
-    from flask_jwt_extended import JWTManager
     from app.models.base import db
+    from app.libs import jwt, metrics, profiler, ratelimit, recorder
+    from app.libs.audit import audit
+    from app.scrapyd_client import jobs, log_archive, throughput
+    from app.scrapyd_client.scheduler import scheduler
 
     db.init_app(app)
-    JWTManager(app)
+    jwt.init_app(app)
+    metrics.init_app(app)
+    recorder.init_app(app)
+    ratelimit.init_app(app)
+    profiler.init_app(app)
+    jobs.init_app(app)
+    log_archive.init_app(app)
+    throughput.init_app(app)
+    audit.init_app(app)
+    scheduler.init_app(app)
+
+
+def register_commands(app: Flask) -> None:
+    """注册命令行命令"""
+    import click
+    from app.scrapyd_client.cluster import get_clients
+    from app.scrapyd_client.log_archive import get_archive
+    from app.scrapyd_client.scheduler import scheduler
+
+    @app.cli.command("archive-logs")
+    @click.option("--project", "projects", multiple=True, help="只归档指定项目，可重复指定")
+    def archive_logs(projects):
+        """归档所有节点上已完成作业的日志"""
+        archive = get_archive()
+        for node in get_clients():
+            for project in projects or node.list_projects():
+                result = archive.archive_finished(node, project)
+                click.echo(f"{node.name} {project}: 新归档 {len(result['archived'])}, "
+                           f"已存在 {result['skipped']}, 失败 {len(result['failed'])}")
+
+    @app.cli.command("scheduler")
+    def run_scheduler():
+        """在前台运行周期调度"""
+        scheduler.start()
+        try:
+            scheduler.wait()
+        except KeyboardInterrupt:
+            scheduler.close()
 
 
 def create_app(env: str = "dev") -> Flask:
@@ -25,10 +69,13 @@ def create_app(env: str = "dev") -> Flask:
 
     if env == "dev":
         app.config.from_object("app.config.Development")
+    elif env == "test":
+        app.config.from_object("app.config.Testing")
     else:
         app.config.from_object("app.config.Productions")
 
     register_plugins(app)
     register_blueprints(app)
+    register_commands(app)
 
     return app
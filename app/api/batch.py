@@ -0,0 +1,113 @@
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from flask import Blueprint, Flask, current_app, g, jsonify, request
+
+from app.libs.jwt import VERIFIED_JWT_ENVIRON, verify_jwt
+from app.scrapyd_client.cluster import run_concurrently
+
+batch_api = Blueprint("batch_api", __name__)
+
+# 子请求只能访问这些蓝图下的接口
+BATCH_BLUEPRINTS = ("spider_api",)
+BATCH_METHODS = ("GET", "POST", "PUT", "DELETE")
+
+
+def _dispatch(app: Flask, entry: Dict[str, Any], headers: Dict[str, str],
+              environ: Dict[str, Any]) -> Dict[str, Any]:
+    """在独立的请求上下文中执行一个子请求
+
+    子请求经过完整的请求处理流程(限流、指标等钩子)，但不经过HTTP与WSGI层
+    """
+    method = str(entry.get("method", "GET")).upper()
+    path = entry.get("path")
+    params = entry.get("params")
+    result: Dict[str, Any] = {"id": entry.get("id")}
+    if not isinstance(path, str) or not path.startswith("/") or method not in BATCH_METHODS \
+            or not isinstance(params, (dict, type(None))):
+        result.update(status=400, body={"code": 400, "message": "子请求格式错误"})
+        return result
+
+    url = urlsplit(path)
+    if params and url.query:
+        result.update(status=400, body={"code": 400, "message": "params与路径中的查询字符串不能同时使用"})
+        return result
+    kwargs: Dict[str, Any] = {"method": method, "query_string": params or url.query, "headers": headers,
+                              "environ_base": environ}
+    if entry.get("body") is not None:
+        kwargs["json"] = entry["body"]
+
+    with app.test_request_context(url.path, **kwargs):
+        if request.routing_exception is not None:
+            # 未匹配的路径返回JSON错误，而不是Flask默认的HTML错误页
+            status = 405 if getattr(request.routing_exception, "code", None) == 405 else 404
+            message = "子请求方法不被允许" if status == 405 else "不支持的子请求路径"
+            result.update(status=status, body={"code": status, "message": message})
+            return result
+        if request.blueprint not in BATCH_BLUEPRINTS:
+            result.update(status=404, body={"code": 404, "message": "不支持的子请求路径"})
+            return result
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            current_app.logger.error(f"批量子请求执行失败 {method} {path}: {str(e)}")
+            result.update(status=500, body={"code": 500, "message": "子请求执行失败"})
+            return result
+        body = response.get_json(silent=True)
+        result.update(status=response.status_code,
+                      body=body if body is not None else response.get_data(as_text=True))
+    return result
+
+
+@batch_api.route("/batch", methods=["POST"])
+def batch():
+    """在一次请求中并发执行多个爬虫接口请求
+
+    令牌在批量请求上统一校验，无效时整体拒绝；校验结果直接传给子请求，子请求不再重复校验。
+    子请求以同一身份计入审计与限流，每个子请求按所属端点的限流类别各消耗一个令牌，
+    批量请求本身另外消耗一个default类别的令牌。
+    子请求之间并发执行，并发的相同Scrapyd查询会被合并为一次上游请求
+
+    请求参数:
+        requests: 子请求列表，每项包含
+            id: 调用方自定义的标识，原样返回，可选
+            method: 请求方法，默认GET
+            path: 接口路径，可带查询字符串，如"/jobs?project=demo"
+            params: 查询参数对象，可选，不能与path中的查询字符串同时使用
+            body: JSON请求体，可选
+
+    返回:
+        与requests顺序一致的结果列表，每项包含id、status(子请求的HTTP状态码)与body
+    """
+    data = request.get_json(silent=True) or {}
+    entries = data.get("requests")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"code": 400, "message": "缺少子请求列表"})
+    if len(entries) > current_app.config.get("BATCH_MAX_REQUESTS", 50):
+        return jsonify({"code": 400, "message": "子请求数量超过上限"})
+    if not all(isinstance(entry, dict) for entry in entries):
+        return jsonify({"code": 400, "message": "子请求格式错误"})
+
+    try:
+        verify_jwt(optional=True)
+    except Exception as e:
+        return jsonify({"code": 401, "message": f"令牌无效: {str(e)}"}), 401
+
+    headers: Dict[str, str] = {}
+    authorization: Optional[str] = request.headers.get("Authorization")
+    if authorization:
+        headers["Authorization"] = authorization
+
+    environ: Dict[str, Any] = {"REMOTE_ADDR": request.remote_addr}
+    if g.get("_jwt_extended_jwt"):
+        environ[VERIFIED_JWT_ENVIRON] = (g._jwt_extended_jwt_header, g._jwt_extended_jwt)
+
+    app = current_app._get_current_object()
+    results = run_concurrently(lambda entry: _dispatch(app, entry, headers, environ), entries,
+                               current_app.config.get("BATCH_MAX_WORKERS", 16))
+    data = [
+        r["result"] if r["ok"] else {"id": entry.get("id"), "status": 500,
+                                     "body": {"code": 500, "message": r["error"]}}
+        for entry, r in zip(entries, results)
+    ]
+    return jsonify({"code": 200, "data": data})
@@ -0,0 +1,27 @@
+from flask import Blueprint, jsonify, send_file
+from app.libs.jwt import require_access_level
+from app.libs.profiler import PROFILE_ACCESS_LEVEL, get_store
+
+
+profile_api = Blueprint("profile_api", __name__)
+
+
+@profile_api.route("", methods=["GET"])
+@require_access_level(PROFILE_ACCESS_LEVEL)
+def list_profiles():
+    """获取已保存的性能分析结果列表"""
+    return jsonify({"code": 200, "data": get_store().list()})
+
+
+@profile_api.route("/<profile_id>", methods=["GET"])
+@require_access_level(PROFILE_ACCESS_LEVEL)
+def download_profile(profile_id):
+    """下载性能分析结果
+
+    cprofile方式为pstats格式，可用snakeviz等工具查看；
+    sample方式为折叠栈格式，可直接生成火焰图
+    """
+    path = get_store().path(profile_id)
+    if not path:
+        return jsonify({"code": 404, "message": "分析结果不存在"}), 404
+    return send_file(path, as_attachment=True)
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from app.models.users import UsersModel
-from app.libs.jwt import generate_tokens, refresh_access_token, revoke_token, get_jwt, login_required
+from app.libs.jwt import generate_tokens, refresh_access_token, revoke_token, get_jwt, get_current_user, login_required
 from app.models.base import db
 from app.validators.forms import LoginRequestFrom
 
@@ -77,7 +77,7 @@ def login():
         return jsonify({"msg": "用户名或密码错误"}), 401
     
     # 生成令牌
-    tokens = generate_tokens(user_info['id'], user_info)
+    tokens = generate_tokens(str(user_info['id']), user_info)
     
     return jsonify(tokens), 200
 
@@ -134,17 +134,11 @@ def profile():
         成功: {"id": 1, "username": "...", ...}, 200
         失败: {"msg": "错误信息"}, 401
     """
-    token = get_jwt()
-    user_id = token.get('sub')
-    
-    if not user_id:
-        return jsonify({"msg": "无效的令牌"}), 401
-    
-    user = UsersModel.query.get(user_id)
-    if not user:
+    current_user = get_current_user()
+    if not current_user:
         return jsonify({"msg": "用户不存在"}), 404
     
     return jsonify({
-        "id": user.id,
-        "username": user.nickname
-    }), 200
\ No newline at end of file
+        "id": current_user["id"],
+        "username": current_user["username"]
+    }), 200
@@ -1 +1 @@
-from app.config.config import Development, Productions
+from app.config.config import Development, Testing, Productions
@@ -0,0 +1,164 @@
+"""操作审计日志
+
+审计记录先进入有界队列，由后台线程按数量或时间阈值批量插入数据库，
+请求处理路径上不会产生额外的数据库提交。队列已满时丢弃记录，每次丢弃都会计数并输出警告日志，不阻塞请求。
+未携带令牌的请求以客户端地址作为操作人。
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, has_request_context, request
+from sqlalchemy import insert
+
+from app.libs import metrics
+from app.libs.jwt import current_identity
+from app.models.audit import AuditLogModel
+from app.models.base import db
+
+AUDIT_RECORDS = metrics.registry.register(metrics.Counter(
+    "webspider_audit_records_total", "审计记录处理数量", ("result",)))
+
+logger = logging.getLogger(__name__)
+
+
+def current_operator() -> Optional[str]:
+    """获取当前请求的操作人
+
+    未携带有效令牌时以客户端地址标识，形如anonymous@10.0.0.1，不在请求中时返回None
+    """
+    identity = current_identity()
+    if identity is not None or not has_request_context():
+        return identity
+    return f"anonymous@{request.remote_addr or 'unknown'}"
+
+
+class AuditWriter:
+    """审计日志的写后缓冲"""
+
+    def __init__(self) -> None:
+        self.app: Optional[Flask] = None
+        self.batch_size = 200
+        self.flush_interval = 2.0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        """绑定应用并读取配置"""
+        self.app = app
+        self.batch_size = app.config.get("AUDIT_BATCH_SIZE", 200)
+        self.flush_interval = app.config.get("AUDIT_FLUSH_INTERVAL", 2.0)
+        self._queue = queue.Queue(maxsize=app.config.get("AUDIT_QUEUE_SIZE", 10000))
+        app.extensions["audit"] = self
+
+    def record(self, action: str, project: Optional[str] = None, spider: Optional[str] = None,
+               target: Optional[str] = None, node: Optional[str] = None,
+               detail: Optional[Dict[str, Any]] = None, operator: Optional[str] = None) -> None:
+        """记录一次操作
+
+        Args:
+            action: 操作类型，如schedule、cancel、delete_project、deploy
+            project: 项目名称
+            spider: 爬虫名称
+            target: 操作对象，如作业ID或版本号
+            node: 节点
+            detail: 附加信息
+            operator: 操作人，默认取当前请求令牌中的身份
+        """
+        row = {
+            "operator": operator if operator is not None else current_operator(),
+            "action": action,
+            "project": project,
+            "spider": spider,
+            "target": target,
+            "node": node,
+            "detail": json.dumps(detail, ensure_ascii=False, default=str) if detail else None,
+            "created_time": int(time.time()),
+            "status": 1,
+        }
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            AUDIT_RECORDS.labels("dropped").inc()
+            logger.warning(f"审计队列已满，丢弃记录: {action} {project} {target}")
+            return
+        AUDIT_RECORDS.labels("queued").inc()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        """等待第一条记录，然后在时间阈值内凑满一批"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(AuditLogModel), batch)
+                db.session.commit()
+                AUDIT_RECORDS.labels("written").inc(len(batch))
+            except Exception as e:
+                db.session.rollback()
+                AUDIT_RECORDS.labels("failed").inc(len(batch))
+                logger.error(f"审计记录写入失败({len(batch)}条): {str(e)}")
+
+    def drain(self) -> None:
+        """立即写入队列中的全部记录"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._flush(batch)
+
+    def close(self) -> None:
+        """停止后台线程并写入剩余记录"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        self._thread = None
+        self.drain()
+
+
+audit = AuditWriter()
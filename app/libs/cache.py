@@ -0,0 +1,78 @@
+"""进程内有界缓存"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from app.libs import metrics
+
+
+class LRUCache:
+    """线程安全的LRU缓存，条目可以带过期时间
+
+    超过容量时淘汰最久未使用的条目，过期条目在读取时删除。命中情况记录到缓存指标中
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            name (str): 缓存名称，用作指标标签
+            maxsize (int, optional): 最多保存的条目数. Defaults to 1024.
+            ttl (Optional[float], optional): 写入时未指定过期时间的条目的存活秒数，None表示不过期. Defaults to None.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+
+    def configure(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        """调整容量与默认存活时间，超出容量的条目立即淘汰"""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            while len(self._entries) > max(0, maxsize):
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取条目，不存在或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is not None and expires_at <= time.time():
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+        metrics.record_cache(self.name, entry is not None)
+        return None if entry is None else value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """写入条目
+
+        Args:
+            key (Hashable): 键
+            value (Any): 值，不能为None
+            expires_at (Optional[float], optional): 过期的时间戳，未指定时按默认存活时间计算. Defaults to None.
+        """
+        if self.maxsize <= 0:
+            return
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,110 @@
+"""五段式cron表达式
+
+支持 ``分 时 日 月 周`` 五个字段，每个字段可以是 ``*``、数字、范围 ``a-b``、
+步长 ``*/n``、``a-b/n`` 以及逗号分隔的列表。周字段中0和7都表示周日。
+日与周同时被限定时，满足其一即可(与标准cron一致)。
+"""
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+# 各字段的取值范围
+FIELDS: Tuple[Tuple[str, int, int], ...] = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+)
+
+
+def _parse_field(expr: str, name: str, low: int, high: int) -> List[int]:
+    values = set()
+    for part in expr.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"{name}字段步长必须大于0")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"{name}字段超出范围: {part}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronExpression:
+    """解析后的cron表达式"""
+
+    def __init__(self, expr: str) -> None:
+        """
+        Args:
+            expr: cron表达式，如 "*/15 2-5 * * 1-5"
+
+        Raises:
+            ValueError: 表达式格式错误
+        """
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError("cron表达式必须包含5个字段")
+        self.expr = expr
+        try:
+            parsed = [_parse_field(p, *field) for p, field in zip(parts, FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"cron表达式错误: {e}")
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # 统一为datetime.weekday()的取值: 周一为0，周日为6
+        self.weekdays = sorted({(w - 1) % 7 for w in weekdays})
+        self._any_day = parts[2] == "*"
+        self._any_weekday = parts[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = dt.weekday() in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, dt: datetime) -> datetime:
+        """计算严格晚于dt的下一次触发时间
+
+        按月、日、时、分逐级跳过不匹配的区间，不逐分钟扫描
+
+        Raises:
+            ValueError: 表达式永远不会触发(如2月30日)
+        """
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t.year + 8
+        while t.year <= limit:
+            if t.month not in self.months:
+                i = bisect_left(self.months, t.month)
+                if i < len(self.months):
+                    t = t.replace(month=self.months[i], day=1, hour=0, minute=0)
+                else:
+                    t = t.replace(year=t.year + 1, month=self.months[0], day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if t.hour not in self.hours:
+                i = bisect_left(self.hours, t.hour)
+                if i < len(self.hours):
+                    t = t.replace(hour=self.hours[i], minute=0)
+                else:
+                    t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            i = bisect_left(self.minutes, t.minute)
+            if i < len(self.minutes):
+                return t.replace(minute=self.minutes[i])
+            t = (t + timedelta(hours=1)).replace(minute=0)
+        raise ValueError(f"cron表达式不会触发: {self.expr}")
@@ -1,8 +1,17 @@
+import hashlib
+import itertools
 from functools import wraps
 from typing import Callable, TypeVar, Dict, Any, Optional, Union
 from datetime import datetime, timedelta
-from flask import jsonify, current_app
+from flask import Flask, g, jsonify, current_app, request
 from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_current_user, create_access_token, create_refresh_token, get_jwt, get_jwt_identity
+from flask_jwt_extended.config import config as jwt_config
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.libs.cache import LRUCache
+from app.models.base import db
+from app.models.users import UsersModel
 
 F = TypeVar("F", bound=Callable[..., object])
 
@@ -12,6 +21,138 @@ jwt = JWTManager()
 # 存储已撤销的令牌
 revoked_tokens = set()
 
+# 已通过签名校验的访问令牌，键为令牌摘要，条目在令牌过期时失效
+token_cache = LRUCache("jwt_token", maxsize=4096)
+# 数据库中的用户信息，用户被修改或删除时失效；多进程部署时其他进程依靠存活时间兜底
+user_cache = LRUCache("jwt_user", maxsize=1024, ttl=60)
+# session.info中记录待清除缓存的用户ID的键
+CHANGED_USERS_KEY = "webspider_changed_users"
+# 内部请求携带的已校验令牌(jwt_header, jwt_data)在environ中的键
+VERIFIED_JWT_ENVIRON = "webspider.verified_jwt"
+
+
+def init_app(app: Flask) -> None:
+    """注册JWT扩展并按配置设置令牌与用户缓存"""
+    jwt.init_app(app)
+    token_cache.configure(app.config.get("JWT_TOKEN_CACHE_SIZE", 4096))
+    user_cache.configure(app.config.get("JWT_USER_CACHE_SIZE", 1024),
+                         app.config.get("JWT_USER_CACHE_TTL", 60))
+
+
+def _load_user_record(identity: Any) -> Optional[Dict[str, Any]]:
+    """按身份读取用户记录，经过LRU缓存"""
+    key = str(identity)
+    record = user_cache.get(key)
+    if record is None:
+        try:
+            user_id = int(key)
+        except ValueError:
+            return None
+        user = db.session.get(UsersModel, user_id)
+        if user is None:
+            return None
+        record = {"id": user.id, "username": user.nickname, "status": user.status}
+        user_cache.set(key, record)
+    return record
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context: Any) -> None:
+    """记录事务中被修改或删除的用户，提交后再清除缓存
+
+    在写入时就清除缓存的话，其他请求可能在提交前重新读到旧记录并写回缓存
+    """
+    changed = session.info.setdefault(CHANGED_USERS_KEY, set())
+    for obj in itertools.chain(session.dirty, session.deleted):
+        if isinstance(obj, UsersModel) and obj.id is not None:
+            changed.add(str(obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    for key in session.info.pop(CHANGED_USERS_KEY, ()):
+        user_cache.invalidate(key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop(CHANGED_USERS_KEY, None)
+
+
+@jwt.user_lookup_loader
+def _user_lookup_callback(jwt_header: Dict[str, Any], jwt_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """加载当前用户信息
+
+    用户名与启用状态取自数据库，访问级别取自令牌声明；用户不存在时令牌无效，用户被删除时视为已禁用。
+    刷新后签发的令牌不带is_active声明，因此启用状态不从令牌中读取
+    """
+    record = _load_user_record(jwt_data.get("sub"))
+    if record is None:
+        return None
+    return {
+        "id": record["id"],
+        "username": record["username"],
+        "is_active": record["status"] == 1,
+        "scope": jwt_data.get("scope"),
+    }
+
+
+def _header_token() -> Optional[str]:
+    """从请求头中取出原始令牌，格式不符时返回None"""
+    if "headers" not in jwt_config.token_location:
+        return None
+    auth_header = request.headers.get(jwt_config.header_name, "").strip()
+    if not auth_header:
+        return None
+    if not jwt_config.header_type:
+        return auth_header
+    parts = auth_header.split()
+    if len(parts) != 2 or parts[0] != jwt_config.header_type:
+        return None
+    return parts[1]
+
+
+def _use_decoded(jwt_header: Dict[str, Any], jwt_data: Dict[str, Any]) -> bool:
+    """把已校验的令牌设置为当前请求的令牌，用户不存在时返回False"""
+    user = _user_lookup_callback(jwt_header, jwt_data)
+    if user is None:
+        return False
+    g._jwt_extended_jwt_user = {"loaded_user": user}
+    g._jwt_extended_jwt_header = jwt_header
+    g._jwt_extended_jwt = jwt_data
+    g._jwt_extended_jwt_location = "headers"
+    return True
+
+
+def verify_jwt(optional: bool = False) -> None:
+    """带缓存的verify_jwt_in_request
+
+    同一个访问令牌只在第一次出现时校验签名与声明，之后直到过期都直接使用缓存的解码结果，
+    用户信息仍然每次通过用户加载函数获取。缓存未命中或令牌不在请求头中时回退到完整校验，
+    错误类型与verify_jwt_in_request一致。
+    应用内部构造的请求(如批量接口的子请求)可以通过environ中的VERIFIED_JWT_ENVIRON
+    传入外层请求已校验的令牌，客户端无法设置该字段
+
+    Args:
+        optional: 为True时允许请求不携带令牌
+    """
+    verified = request.environ.get(VERIFIED_JWT_ENVIRON)
+    if verified is not None and _use_decoded(*verified):
+        return
+
+    token = _header_token()
+    key = None
+    if token is not None and request.method not in jwt_config.exempt_methods:
+        key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+        cached = token_cache.get(key)
+        if cached is not None and _use_decoded(*cached):
+            return
+
+    verify_jwt_in_request(optional=optional)
+    jwt_data = g.get("_jwt_extended_jwt")
+    if key is not None and jwt_data and jwt_data.get("type") == "access" and jwt_data.get("exp"):
+        token_cache.set(key, (g._jwt_extended_jwt_header, jwt_data), expires_at=jwt_data["exp"])
+
 
 def require_access_level(access_level: str) -> Callable[[F], F]:
     """装饰器：要求用户具有特定的访问级别
@@ -25,7 +166,7 @@ def require_access_level(access_level: str) -> Callable[[F], F]:
     def decorator(f: F) -> F:
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            verify_jwt_in_request()
+            verify_jwt()
             current_user = get_current_user()
             try:
                 __check_is_active(current_user)
@@ -39,6 +180,57 @@ def require_access_level(access_level: str) -> Callable[[F], F]:
     return decorator
 
 
+def has_access_level(access_level: str) -> bool:
+    """判断当前请求是否携带具有特定访问级别的有效令牌
+
+    与require_access_level的校验规则一致，但不会中断请求，适用于按需开启的附加功能
+
+    Args:
+        access_level: 所需的访问级别
+
+    Returns:
+        令牌有效、用户处于活动状态且访问级别匹配时为True，否则为False
+    """
+    try:
+        verify_jwt(optional=True)
+    except Exception:
+        return False
+
+    current_user = get_current_user()
+    try:
+        __check_is_active(current_user)
+    except ValueError:
+        return False
+    return current_user.get("scope") == access_level
+
+
+def current_identity() -> Optional[str]:
+    """获取当前请求令牌中的身份，未携带令牌或令牌无效时返回None
+
+    Returns:
+        身份字符串或None
+    """
+    try:
+        verify_jwt(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        return None
+    return None if identity is None else str(identity)
+
+
+def current_scope() -> Optional[str]:
+    """获取当前请求令牌中的访问级别，未携带令牌或令牌无效时返回None
+
+    Returns:
+        访问级别或None
+    """
+    try:
+        verify_jwt(optional=True)
+        return get_jwt().get("scope")
+    except Exception:
+        return None
+
+
 def login_required(f: F) -> F:
     """装饰器：要求用户登录
     
@@ -50,7 +242,7 @@ def login_required(f: F) -> F:
     """
     @wraps(f)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
+        verify_jwt()
         token = get_jwt()
         
         # 检查令牌是否被撤销
@@ -114,12 +306,22 @@ def generate_tokens(user_id: Union[str, int], additional_claims: Optional[Dict[s
 
 def refresh_access_token() -> Dict[str, str]:
     """使用刷新令牌生成新的访问令牌
+
+    新令牌的访问级别按用户当前的配置重新确定
     
     Returns:
         包含新访问令牌的字典
+
+    Raises:
+        ValueError: 刷新令牌对应的用户不存在
     """
+    verify_jwt_in_request(refresh=True)
     current_user = get_jwt_identity()
-    new_access_token = create_access_token(identity=current_user, fresh=False)
+    record = _load_user_record(current_user)
+    if record is None:
+        raise ValueError("用户信息不存在")
+    new_access_token = create_access_token(identity=current_user, fresh=False,
+                                           additional_claims={"scope": UsersModel.scope_of(record["username"])})
     
     return {"access_token": new_access_token}
 
@@ -139,7 +341,7 @@ def get_user_info() -> Dict[str, Any]:
     Returns:
         用户信息字典
     """
-    verify_jwt_in_request()
+    verify_jwt()
     return get_current_user()
 
 
@@ -0,0 +1,295 @@
+"""Prometheus文本格式的运行指标
+
+提供计数器、仪表盘与直方图三种指标，标签组合对应的子指标在首次使用时创建并缓存，
+桶边界预先分配，记录时只做一次二分查找与加锁累加，不会为每个请求构造标签字典。
+"""
+import hashlib
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+
+# 延迟直方图桶(秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 响应大小直方图桶(字节)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # 最后一个桶对应+Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    """指标基类，按标签值元组缓存子指标"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """获取标签值对应的子指标
+
+        Args:
+            *values: 与labelnames顺序一致的标签值
+
+        Returns:
+            子指标对象
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要 {len(self.labelnames)} 个标签值")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, child in self.children():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        names = self.labelnames + ("le",)
+        for values, child in self.children():
+            with child._lock:
+                counts = list(child.counts)
+                total_sum = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(names, values + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total_sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """注册在导出时才计算的指标"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """以Prometheus文本格式导出全部指标"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "webspider_http_request_duration_seconds", "webspider接口处理耗时",
+    ("endpoint", "method", "status")))
+HTTP_REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "webspider_http_requests_in_flight", "正在处理的webspider接口请求数", ("endpoint",)))
+HTTP_RESPONSE_SIZE = registry.register(Histogram(
+    "webspider_http_response_size_bytes", "webspider接口响应大小", ("endpoint",), SIZE_BUCKETS))
+
+SCRAPYD_REQUEST_DURATION = registry.register(Histogram(
+    "webspider_scrapyd_request_duration_seconds", "Scrapyd接口请求耗时",
+    ("endpoint", "node", "status")))
+SCRAPYD_REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "webspider_scrapyd_requests_in_flight", "正在进行的Scrapyd接口请求数", ("endpoint", "node")))
+SCRAPYD_RESPONSE_SIZE = registry.register(Histogram(
+    "webspider_scrapyd_response_size_bytes", "Scrapyd接口响应大小", ("endpoint", "node"), SIZE_BUCKETS))
+
+CACHE_REQUESTS = registry.register(Counter(
+    "webspider_cache_requests_total", "缓存查询次数", ("cache", "result")))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """记录一次缓存查询结果
+
+    Args:
+        cache: 缓存名称
+        hit: 是否命中
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def _cache_hit_ratio() -> Iterable[str]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), child in CACHE_REQUESTS.children():
+        hits_total = totals.setdefault(cache, [0.0, 0.0])
+        if result == "hit":
+            hits_total[0] += child.value
+        hits_total[1] += child.value
+    yield "# HELP webspider_cache_hit_ratio 缓存命中率"
+    yield "# TYPE webspider_cache_hit_ratio gauge"
+    for cache, (hits, total) in totals.items():
+        ratio = hits / total if total else 0.0
+        yield f"webspider_cache_hit_ratio{_format_labels(('cache',), (cache,))} {_format_value(ratio)}"
+
+
+registry.add_collector(_cache_hit_ratio)
+
+
+def scrapyd_endpoint_label(endpoint: str) -> str:
+    """将Scrapyd端点归一化为标签值，避免日志、数据项路径造成标签基数膨胀"""
+    return endpoint.split("/", 1)[0]
+
+
+def node_alias(target: str) -> str:
+    """未命名节点的指标标签值
+
+    /metrics无需认证即可访问，标签中不能出现Scrapyd节点的内部地址，这里用地址的哈希代替
+    """
+    return "node-" + hashlib.blake2b(target.encode("utf-8"), digest_size=4).hexdigest()
+
+
+def _before_request() -> None:
+    endpoint = request.endpoint
+    if endpoint is None or endpoint == "metrics":
+        return
+    g._metrics_endpoint = endpoint
+    g._metrics_start = time.perf_counter()
+    g._metrics_status = "500"
+    HTTP_REQUESTS_IN_FLIGHT.labels(endpoint).inc()
+
+
+def _after_request(response: Response) -> Response:
+    endpoint = g.get("_metrics_endpoint")
+    if endpoint is not None:
+        g._metrics_status = str(response.status_code)
+        size = response.calculate_content_length()
+        if size is not None:
+            HTTP_RESPONSE_SIZE.labels(endpoint).observe(size)
+    return response
+
+
+def _teardown_request(exc: Optional[BaseException]) -> None:
+    endpoint = g.get("_metrics_endpoint")
+    if endpoint is None:
+        return
+    HTTP_REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+    HTTP_REQUEST_DURATION.labels(endpoint, request.method, g._metrics_status).observe(
+        time.perf_counter() - g._metrics_start)
+
+
+def metrics_view() -> Response:
+    """导出Prometheus文本格式指标"""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_app(app: Flask) -> None:
+    """为应用注册请求生命周期埋点与/metrics接口"""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
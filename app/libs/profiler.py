@@ -0,0 +1,237 @@
+"""按请求开启的性能分析
+
+管理员可以通过请求头 ``X-Profile`` 或查询参数 ``__profile`` 为单个请求开启分析，
+也可以通过 ``PROFILE_SAMPLE_RATE`` 对一定比例的流量自动分析。支持两种方式:
+
+- cprofile: 确定性分析，结果为pstats格式的 ``.prof`` 文件
+- sample: 低开销的栈采样分析，结果为火焰图工具可直接读取的折叠栈 ``.folded`` 文件
+
+分析覆盖视图函数的完整调用栈，包括其中的ScrapydClient请求。
+"""
+import cProfile
+import json
+import logging
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, Response, current_app, g, request
+
+from app.libs.jwt import has_access_level
+
+# 显式开启分析所需的访问级别
+PROFILE_ACCESS_LEVEL = "admin"
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_ARG = "__profile"
+MODES = ("cprofile", "sample")
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """在后台线程中周期性采集目标线程的调用栈"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+
+    def folded(self) -> bytes:
+        """导出折叠栈格式的火焰图数据"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode("utf-8")
+
+
+class ProfileStore:
+    """分析结果存储，超过保留上限时删除最旧的结果"""
+
+    EXTENSIONS = {"cprofile": ".prof", "sample": ".folded"}
+
+    def __init__(self, directory: str, max_files: int = 200) -> None:
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, mode: str, data: bytes, meta: Dict[str, Any]) -> None:
+        """保存分析结果及其元数据
+
+        Args:
+            profile_id: 分析结果ID
+            mode: 分析方式
+            data: 分析数据
+            meta: 元数据(接口、耗时等)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, profile_id + self.EXTENSIONS[mode]), "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.directory, profile_id + ".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._enforce_retention()
+
+    def _enforce_retention(self) -> None:
+        with self._lock:
+            metas = self._meta_files()
+            for name in metas[:max(0, len(metas) - self.max_files)]:
+                self.delete(name[:-len(".json")])
+
+    def _meta_files(self) -> List[str]:
+        """按创建时间升序返回元数据文件名"""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        return sorted(names, key=lambda n: os.path.getmtime(os.path.join(self.directory, n)))
+
+    def delete(self, profile_id: str) -> None:
+        for ext in (".json",) + tuple(self.EXTENSIONS.values()):
+            try:
+                os.remove(os.path.join(self.directory, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """按时间倒序列出所有分析结果的元数据"""
+        result = []
+        for name in reversed(self._meta_files()):
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    result.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return result
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """获取分析结果文件路径，不存在时返回None"""
+        if not profile_id or os.path.basename(profile_id) != profile_id:
+            return None
+        for ext in self.EXTENSIONS.values():
+            path = os.path.join(self.directory, profile_id + ext)
+            if os.path.exists(path):
+                return os.path.abspath(path)
+        return None
+
+
+def get_store() -> ProfileStore:
+    """获取当前应用的分析结果存储"""
+    return current_app.extensions["profile_store"]
+
+
+def _requested_mode() -> Optional[str]:
+    """解析请求中显式指定的分析方式，未指定时返回None"""
+    value = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_ARG)
+    if not value:
+        return None
+    return value if value in MODES else current_app.config.get("PROFILE_DEFAULT_MODE", "sample")
+
+
+def _before_request() -> None:
+    mode = _requested_mode()
+    if mode is not None:
+        # 非管理员的分析请求直接忽略，不影响正常处理
+        if not has_access_level(PROFILE_ACCESS_LEVEL):
+            return
+    else:
+        rate = current_app.config.get("PROFILE_SAMPLE_RATE", 0.0)
+        if not rate or random.random() >= rate:
+            return
+        mode = current_app.config.get("PROFILE_DEFAULT_MODE", "sample")
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Python 3.12起cProfile占用进程唯一的sys.monitoring工具槽位，
+            # 已有请求在做确定性分析时改用采样分析
+            logger.info(f"无法开启cProfile，改用采样分析: {str(e)}")
+            mode = "sample"
+    if mode != "cprofile":
+        profiler = SamplingProfiler(threading.get_ident(),
+                                    current_app.config.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+        profiler.start()
+    g._profile = (mode, profiler, time.perf_counter())
+
+
+def _stop_profile() -> Optional[Dict[str, Any]]:
+    state = g.pop("_profile", None)
+    if state is None:
+        return None
+    mode, profiler, start = state
+    duration = time.perf_counter() - start
+    if mode == "cprofile":
+        profiler.disable()
+        profiler.create_stats()
+        data = marshal.dumps(profiler.stats)
+    else:
+        profiler.stop()
+        data = profiler.folded()
+    return {"mode": mode, "duration": duration, "data": data}
+
+
+def _save(result: Dict[str, Any], status: int) -> str:
+    profile_id = uuid.uuid4().hex
+    meta = {
+        "id": profile_id,
+        "mode": result["mode"],
+        "endpoint": request.endpoint,
+        "method": request.method,
+        "path": request.path,
+        "status": status,
+        "duration": round(result["duration"], 6),
+        "created_time": int(time.time()),
+    }
+    try:
+        get_store().save(profile_id, result["mode"], result["data"], meta)
+    except OSError as e:
+        logger.error(f"保存分析结果失败: {str(e)}")
+    return profile_id
+
+
+def _after_request(response: Response) -> Response:
+    result = _stop_profile()
+    if result is not None:
+        response.headers["X-Profile-Id"] = _save(result, response.status_code)
+    return response
+
+
+def _teardown_request(exc: Optional[BaseException]) -> None:
+    # 视图抛出异常时after_request不会执行，在此保证分析器被关闭
+    result = _stop_profile()
+    if result is not None:
+        _save(result, 500)
+
+
+def init_app(app: Flask) -> None:
+    """注册按请求分析的钩子"""
+    app.extensions["profile_store"] = ProfileStore(
+        app.config.get("PROFILE_DIR", "profiles"), app.config.get("PROFILE_MAX_FILES", 200))
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,244 @@
+"""准入控制与限流
+
+每个请求按端点归入一个限流类别，以(类别, 身份)为键使用令牌桶限速。身份取JWT中的identity，
+未登录时取客户端地址。高开销类别的请求还需要占用全局并发槽位，槽位用尽时立即拒绝，
+而不是排队等到超时。被拒绝的请求返回429并带有Retry-After。
+
+令牌桶状态保存在SQLite文件中，并发槽位基于文件锁(flock)，同一台机器上的所有工作进程共享限额；
+持有槽位的进程退出时锁会被自动释放。限流存储出错时放行请求，不影响正常服务。
+"""
+import logging
+import math
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, jsonify, request
+
+from app.libs import metrics
+from app.libs.jwt import current_identity
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - 非POSIX平台退回进程内信号量
+    fcntl = None
+
+RATELIMIT_REJECTED = metrics.registry.register(metrics.Counter(
+    "webspider_ratelimit_rejected_total", "被限流拒绝的请求数", ("limit_class", "reason")))
+
+logger = logging.getLogger(__name__)
+
+# 长时间未使用的令牌桶已经回满，删除它们与保留它们等价
+PRUNE_AFTER = 3600
+PRUNE_PROBABILITY = 0.001
+
+
+class TokenBucketStore:
+    """基于SQLite的令牌桶，多个进程可以共享同一个文件"""
+
+    def __init__(self, path: str, pool_size: int = 16) -> None:
+        self.path = path
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        # 同一进程内的线程先在这里排队，SQLite的忙等待会以递增的间隔休眠，竞争时尾延迟很高
+        self._write_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        if not self._initialized:
+            with self._init_lock:
+                conn.execute("CREATE TABLE IF NOT EXISTS buckets ("
+                             "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+                self._initialized = True
+        return conn
+
+    def _acquire_conn(self) -> sqlite3.Connection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            return self._connect()
+
+    def _release_conn(self, conn: sqlite3.Connection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """从令牌桶中取出一个令牌
+
+        Args:
+            key (str): 令牌桶键
+            rate (float): 每秒补充的令牌数
+            burst (float): 令牌桶容量
+
+        Returns:
+            float: 0表示放行，否则为令牌补足前需要等待的秒数
+        """
+        conn = self._acquire_conn()
+        try:
+            with self._write_lock:
+                now = time.time()
+                # IMMEDIATE事务保证多个进程对同一个桶的读-改-写是串行的
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                    tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                    wait = 0.0
+                    if tokens >= 1:
+                        tokens -= 1
+                    else:
+                        wait = (1 - tokens) / rate
+                    conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                                 (key, tokens, now))
+                    if random.random() < PRUNE_PROBABILITY:
+                        conn.execute("DELETE FROM buckets WHERE updated < ?", (now - PRUNE_AFTER,))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        except BaseException:
+            conn.close()
+            raise
+        self._release_conn(conn)
+        return wait
+
+
+class ConcurrencySlots:
+    """跨进程的并发槽位，每个槽位对应一个锁文件"""
+
+    def __init__(self, directory: str, name: str, size: int) -> None:
+        self.directory = directory
+        self.name = name
+        self.size = size
+        self._semaphore = threading.BoundedSemaphore(size) if fcntl is None else None
+
+    def _path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{number}.lock")
+
+    def acquire(self) -> Optional[Any]:
+        """非阻塞地占用一个槽位
+
+        Returns:
+            Optional[Any]: 槽位句柄，槽位已满时返回None
+        """
+        if self._semaphore is not None:
+            return self._semaphore if self._semaphore.acquire(blocking=False) else None
+        os.makedirs(self.directory, exist_ok=True)
+        # 从随机位置开始尝试，减少并发请求争抢同一个槽位
+        start = random.randrange(self.size)
+        for i in range(self.size):
+            fd = os.open(self._path((start + i) % self.size), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def release(self, handle: Any) -> None:
+        if self._semaphore is not None:
+            self._semaphore.release()
+            return
+        try:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            os.close(handle)
+
+
+class RateLimiter:
+    """按端点类别与身份限流"""
+
+    def __init__(self, directory: str, classes: Dict[str, Dict[str, float]],
+                 endpoint_classes: Dict[str, str], concurrency: Dict[str, int]) -> None:
+        """
+        Args:
+            directory (str): 令牌桶数据库与锁文件目录
+            classes (Dict[str, Dict[str, float]]): 类别名到{"rate": 每秒令牌数, "burst": 容量}的映射
+            endpoint_classes (Dict[str, str]): 端点名到类别名的映射，未列出的端点属于default类别
+            concurrency (Dict[str, int]): 类别名到全局并发上限的映射
+        """
+        self.classes = classes
+        self.endpoint_classes = endpoint_classes
+        self.buckets = TokenBucketStore(os.path.join(directory, "buckets.db"))
+        self.slots = {
+            name: ConcurrencySlots(directory, name, size) for name, size in concurrency.items() if size > 0
+        }
+
+    def classify(self, endpoint: str) -> Optional[str]:
+        """获取端点所属的限流类别，不限流时返回None"""
+        limit_class = self.endpoint_classes.get(endpoint, "default")
+        return limit_class if limit_class in self.classes else None
+
+    def check_rate(self, limit_class: str, identity: str) -> float:
+        """检查令牌桶，返回0表示放行，否则为建议的重试等待秒数"""
+        limit = self.classes[limit_class]
+        try:
+            return self.buckets.take(f"{limit_class}:{identity}", limit["rate"], limit["burst"])
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"限流存储不可用，放行请求: {str(e)}")
+            return 0.0
+
+
+def _too_many_requests(message: str, retry_after: float) -> Tuple[Response, int, Dict[str, str]]:
+    seconds = max(1, math.ceil(retry_after))
+    return jsonify({"code": 429, "message": message}), 429, {"Retry-After": str(seconds)}
+
+
+def _before_request() -> Optional[Tuple[Response, int, Dict[str, str]]]:
+    endpoint = request.endpoint
+    if endpoint is None or request.method == "OPTIONS":
+        return None
+    limiter: RateLimiter = current_app.extensions["ratelimit"]
+    limit_class = limiter.classify(endpoint)
+    if limit_class is None:
+        return None
+
+    identity = current_identity()
+    identity = f"user:{identity}" if identity is not None else f"ip:{request.remote_addr}"
+    retry_after = limiter.check_rate(limit_class, identity)
+    if retry_after > 0:
+        RATELIMIT_REJECTED.labels(limit_class, "rate").inc()
+        return _too_many_requests("请求过于频繁，请稍后重试", retry_after)
+
+    slots = limiter.slots.get(limit_class)
+    if slots is not None:
+        try:
+            handle = slots.acquire()
+        except OSError as e:
+            logger.warning(f"并发槽位不可用，放行请求: {str(e)}")
+            return None
+        if handle is None:
+            RATELIMIT_REJECTED.labels(limit_class, "concurrency").inc()
+            return _too_many_requests("服务繁忙，请稍后重试", 1)
+        g._ratelimit_slot = (slots, handle)
+    return None
+
+
+def _teardown_request(exc: Optional[BaseException]) -> None:
+    slot = g.pop("_ratelimit_slot", None)
+    if slot is not None:
+        slots, handle = slot
+        slots.release(handle)
+
+
+def init_app(app: Flask) -> None:
+    """注册限流，RATELIMIT_ENABLED为False时不生效"""
+    if not app.config.get("RATELIMIT_ENABLED", True):
+        return
+    app.extensions["ratelimit"] = RateLimiter(
+        app.config.get("RATELIMIT_DIR", "ratelimit"),
+        app.config.get("RATELIMIT_CLASSES", {}),
+        app.config.get("RATELIMIT_ENDPOINT_CLASSES", {}),
+        app.config.get("RATELIMIT_CONCURRENCY", {}))
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
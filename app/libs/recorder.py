@@ -0,0 +1,230 @@
+"""请求流量录制
+
+开启后对spider_api与user蓝图的请求进行录制，每个请求写出一行JSON记录，包含接口、参数、
+状态码、耗时以及处理期间发起的Scrapyd调用(参数、状态码、耗时、响应大小与响应体哈希)。
+录制文件可以交给benchmarks/replay.py按原始时间间隔回放，用真实的流量形态做容量测试。
+
+记录经过脱敏: 不保存请求头与上传文件内容，敏感字段的值替换为***，令牌中的身份替换为带密钥的哈希，
+同一身份在各文件中的哈希一致，回放时据此为每个身份签发与录制时访问级别相同的令牌。
+Scrapyd响应体默认只记录大小与哈希；开启RECORDER_UPSTREAM_BODIES后保存较小的JSON响应体，
+同样经过脱敏，非JSON的响应体(日志、数据项)始终不保存。
+
+每个进程写入独立的文件，单条记录通过一次追加写入完成，不需要加锁。
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from flask import Flask, Response, current_app, g, request
+
+from app.libs.jwt import current_identity, current_scope
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+REDACTED = "***"
+# 字段名包含这些片段时值会被替换
+SENSITIVE_PARTS = ("password", "passwd", "secret", "token", "auth", "cookie", "credential")
+
+# 当前请求的录制状态
+_recording: ContextVar[Optional[Dict[str, Any]]] = ContextVar("webspider_recording", default=None)
+
+
+def sanitize(value: Any) -> Any:
+    """递归替换敏感字段的值"""
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if any(part in str(k).lower() for part in SENSITIVE_PARTS) else sanitize(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [sanitize(v) for v in value]
+    return value
+
+
+class TrafficRecorder:
+    """把请求记录追加到JSON Lines文件"""
+
+    def __init__(self, directory: str, blueprints: List[str], sample_rate: float = 1.0,
+                 max_body: int = 1024 * 1024, salt: bytes = b"", upstream_bodies: bool = False) -> None:
+        """
+        Args:
+            directory (str): 录制文件目录
+            blueprints (List[str]): 需要录制的蓝图
+            sample_rate (float, optional): 录制的请求比例. Defaults to 1.0.
+            max_body (int, optional): 保存Scrapyd响应体的大小上限，超过时只记录大小与哈希. Defaults to 1MB.
+            salt (bytes, optional): 身份哈希的密钥. Defaults to b"".
+            upstream_bodies (bool, optional): 是否保存脱敏后的Scrapyd JSON响应体. Defaults to False.
+        """
+        self.directory = directory
+        self.blueprints = set(blueprints)
+        self.sample_rate = sample_rate
+        self.max_body = max_body
+        self.upstream_bodies = upstream_bodies
+        self._key = hashlib.sha256(salt).digest()
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    def pseudonym(self, identity: Optional[str]) -> Optional[str]:
+        if identity is None:
+            return None
+        return hashlib.blake2b(identity.encode("utf-8"), key=self._key, digest_size=8).hexdigest()
+
+    def _file(self) -> int:
+        # 预加载应用后fork的工作进程各自打开新文件
+        pid = os.getpid()
+        if self._fd is None or self._pid != pid:
+            with self._lock:
+                if self._fd is None or self._pid != pid:
+                    os.makedirs(self.directory, exist_ok=True)
+                    name = f"traffic-{time.strftime('%Y%m%d-%H%M%S')}-{pid}.jsonl"
+                    self._fd = os.open(os.path.join(self.directory, name),
+                                       os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+                    self._pid = pid
+        return self._fd
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        try:
+            os.write(self._file(), line.encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"写入流量录制文件失败: {str(e)}")
+
+
+def _uploaded_files() -> Dict[str, Dict[str, Any]]:
+    files: Dict[str, Dict[str, Any]] = {}
+    for name, storage in request.files.items():
+        stream = storage.stream
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        files[name] = {"filename": storage.filename, "size": size}
+    return files
+
+
+def _before_request() -> None:
+    recorder: TrafficRecorder = current_app.extensions["recorder"]
+    if request.blueprint not in recorder.blueprints:
+        return
+    if recorder.sample_rate < 1.0 and random.random() >= recorder.sample_rate:
+        return
+    state = {"t": time.time(), "start": time.perf_counter(),
+             "max_body": recorder.max_body if recorder.upstream_bodies else -1, "upstream": []}
+    g._recording = state
+    _recording.set(state)
+
+
+def _after_request(response: Response) -> Response:
+    state = g.pop("_recording", None)
+    if state is None:
+        return response
+    recorder: TrafficRecorder = current_app.extensions["recorder"]
+    record: Dict[str, Any] = {
+        "t": round(state["t"], 6),
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "query": sanitize(request.args.to_dict(flat=False)),
+        "identity": recorder.pseudonym(current_identity()),
+        "scope": current_scope(),
+        "status": response.status_code,
+        "duration": round(time.perf_counter() - state["start"], 6),
+        "response_size": response.content_length,
+        "upstream": state["upstream"],
+    }
+    if request.is_json:
+        record["json"] = sanitize(request.get_json(silent=True))
+    elif request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        record["form"] = sanitize(request.form.to_dict(flat=False))
+        record["files"] = _uploaded_files()
+    recorder.write(record)
+    return response
+
+
+def _teardown_request(exc: Optional[BaseException]) -> None:
+    _recording.set(None)
+
+
+def record_upstream(method: str, endpoint: str, params: Any, status: str, duration: float,
+                    size: int, body: Optional[bytes] = None) -> None:
+    """记录一次Scrapyd调用，当前请求未在录制时直接返回
+
+    Args:
+        method (str): 请求方法
+        endpoint (str): 接口或文件路径
+        params (Any): 查询参数或表单数据，非字典(如流式上传的请求体)时不记录
+        status (str): 状态码，请求异常时为error
+        duration (float): 耗时(秒)
+        size (int): 响应大小(字节)
+        body (Optional[bytes], optional): 响应体，记录其哈希；开启保存且为不超过大小上限的JSON时
+            脱敏后保存. Defaults to None.
+    """
+    state = _recording.get()
+    if state is None:
+        return
+    call: Dict[str, Any] = {
+        "method": method.upper(),
+        "endpoint": endpoint,
+        "params": sanitize(params) if isinstance(params, dict) else None,
+        "status": status,
+        "at": round(time.perf_counter() - state["start"] - duration, 6),
+        "duration": round(duration, 6),
+        "size": size,
+    }
+    if body is not None:
+        call["body_hash"] = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if len(body) <= state["max_body"]:
+            try:
+                call["body"] = sanitize(json.loads(body))
+            except ValueError:
+                pass
+    # list.append是原子操作，并发的子任务可以直接追加
+    state["upstream"].append(call)
+
+
+def propagate(func: F) -> F:
+    """让在线程池中执行的func继承当前请求的录制状态，使其中的Scrapyd调用计入当前请求
+
+    只传递录制状态而不复制整个上下文，避免工作线程共享请求的应用上下文
+    """
+    state = _recording.get()
+    if state is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _recording.set(state)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _recording.reset(token)
+    return wrapper  # type: ignore[return-value]
+
+
+def init_app(app: Flask) -> None:
+    """注册流量录制，RECORDER_ENABLED为False时不生效
+
+    需在限流之前注册，被限流拒绝的请求同样会被录制
+    """
+    if not app.config.get("RECORDER_ENABLED", False):
+        return
+    salt = app.config.get("RECORDER_SALT") or app.config.get("JWT_SECRET_KEY") or ""
+    app.extensions["recorder"] = TrafficRecorder(
+        app.config.get("RECORDER_DIR", "recordings"),
+        app.config.get("RECORDER_BLUEPRINTS", ["spider_api", "user"]),
+        app.config.get("RECORDER_SAMPLE_RATE", 1.0),
+        app.config.get("RECORDER_MAX_BODY", 1024 * 1024),
+        salt.encode("utf-8") if isinstance(salt, str) else salt,
+        app.config.get("RECORDER_UPSTREAM_BODIES", False))
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
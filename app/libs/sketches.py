@@ -0,0 +1,199 @@
+"""有界内存的流式统计草图
+
+- HyperLogLog: 近似基数(不同值数量)
+- QuantileSketch: KLL分层压缩的近似分位数
+- SpaceSaving: 近似高频值(top-k)
+
+三者都只需单遍扫描，内存与数据量无关(QuantileSketch的层数随数据量对数增长，保存的值约为3k个)。
+HyperLogLog的输入使用blake2b哈希，结果与进程无关，可以在不同进程之间比较。
+"""
+import hashlib
+import heapq
+import math
+import random
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+# KLL中每低一层容量缩小的比例
+CAPACITY_DECAY = 2 / 3
+
+
+def hash64(data: bytes) -> int:
+    """64位哈希"""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """HyperLogLog基数估计，相对标准误差约为1.04/sqrt(2^precision)"""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = 12) -> None:
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add_hash(self, value: int) -> None:
+        """加入一个64位哈希值"""
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, data: bytes) -> None:
+        self.add_hash(hash64(data))
+
+    def count(self) -> int:
+        """估计不同值的数量"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        if estimate <= 2.5 * m:
+            # 小基数时使用线性计数修正
+            zeros = self.registers.count(0)
+            if zeros:
+                estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """KLL近似分位数
+
+    第h层(共H层)的容量为k·c^(H-1-h)，c为CAPACITY_DECAY，最高层容量为k，越低的层越小，
+    总容量约为k/(1-c)。保存的值达到总容量时，从低到高找到第一个写满的层，排序后随机保留
+    奇数位或偶数位的一半提升到上一层，上一层中每个值代表的权重加倍；新增一层后各低层容量随之缩小。
+    最小值与最大值精确记录
+    """
+
+    __slots__ = ("k", "levels", "count", "min", "max", "_size", "_max_size", "_rng")
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None) -> None:
+        self.k = k
+        self.levels: List[List[float]] = [[]]
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._size = 0
+        self._max_size = self._capacity(0)
+        self._rng = random.Random(seed)
+
+    def _capacity(self, height: int) -> int:
+        depth = len(self.levels) - height - 1
+        return max(2, int(math.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.levels[0].append(value)
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        for height, level in enumerate(self.levels):
+            if len(level) < self._capacity(height):
+                continue
+            if height + 1 == len(self.levels):
+                self.levels.append([])
+            level.sort()
+            # 奇数个值时留下最后一个，保证总权重不变
+            kept = [level.pop()] if len(level) % 2 else []
+            promoted = level[self._rng.randint(0, 1)::2]
+            self.levels[height] = kept
+            self.levels[height + 1].extend(promoted)
+            self._size -= len(level) - len(promoted)
+            break
+        self._max_size = sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """计算多个分位数
+
+        Args:
+            qs (Sequence[float]): 0到1之间的分位点
+
+        Returns:
+            List[Optional[float]]: 与qs顺序一致的近似分位数，没有数据时为None
+        """
+        if not self.count:
+            return [None for _ in qs]
+        weighted = sorted((v, 1 << h) for h, level in enumerate(self.levels) for v in level)
+        total = sum(w for _, w in weighted)
+        result: List[Optional[float]] = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+                continue
+            if q >= 1:
+                result.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    result.append(value)
+                    break
+            else:
+                result.append(self.max)
+        return result
+
+
+class SpaceSaving:
+    """Space-Saving高频值统计
+
+    最多跟踪capacity个值，新值在表满时替换计数最小的值并继承其计数。
+    每个值在最小堆中只有一个条目，计数增加时不更新堆，查找最小值时再修正过期条目，
+    已跟踪值的计数为O(1)，替换为均摊O(log capacity)
+    """
+
+    __slots__ = ("capacity", "counts", "errors", "_heap", "_order")
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._order = 0
+
+    def add(self, key: Hashable) -> None:
+        counts = self.counts
+        count = counts.get(key)
+        if count is not None:
+            counts[key] = count + 1
+            return
+        if len(counts) < self.capacity:
+            counts[key] = 1
+            self.errors[key] = 0
+            self._push(1, key)
+            return
+        victim_count, victim = self._pop_min()
+        del counts[victim]
+        del self.errors[victim]
+        counts[key] = victim_count + 1
+        self.errors[key] = victim_count
+        self._push(victim_count + 1, key)
+
+    def _push(self, count: int, key: Hashable) -> None:
+        # 键之间可能无法比较，用递增序号打破平局
+        self._order += 1
+        heapq.heappush(self._heap, (count, self._order, key))
+
+    def _pop_min(self) -> Tuple[int, Hashable]:
+        while True:
+            count, _, key = heapq.heappop(self._heap)
+            current = self.counts[key]
+            if current == count:
+                return count, key
+            self._push(current, key)
+
+    def top(self, n: int) -> List[Tuple[Any, int, int]]:
+        """返回计数最高的n个值
+
+        Returns:
+            List[Tuple[Any, int, int]]: (值, 计数上界, 最大高估量)
+        """
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(key, count, self.errors[key]) for key, count in ranked]
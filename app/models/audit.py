@@ -0,0 +1,28 @@
+from app.models.base import BaseModel
+from sqlalchemy import Column, Integer, String, Text
+
+
+class AuditLogModel(BaseModel):
+    """操作审计记录"""
+    __tablename__ = "audit_log_model"
+    id = Column(Integer, primary_key=True)
+    operator = Column(String(64), index=True)
+    action = Column(String(32), index=True)
+    project = Column(String(64))
+    spider = Column(String(64))
+    target = Column(String(255))
+    node = Column(String(255))
+    detail = Column(Text)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "operator": self.operator,
+            "action": self.action,
+            "project": self.project,
+            "spider": self.spider,
+            "target": self.target,
+            "node": self.node,
+            "detail": self.detail,
+            "created_time": self.created_time,
+        }
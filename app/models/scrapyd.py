@@ -1,5 +1,6 @@
+import json
 from app.models.base import BaseModel
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Text
 
 
 class ScrapydModel(BaseModel):
@@ -9,7 +10,69 @@ class ScrapydModel(BaseModel):
     server_name = Column(String(32))
     username = Column(String(32))
     password = Column(String(128))
-    enable = Column(Integer(default=0))
+    enable = Column(Integer, default=0)
 
     def to_dict(self):
-        pass
+        return {
+            "id": self.id,
+            "server_url": self.server_url,
+            "server_name": self.server_name,
+            "enable": self.enable,
+        }
+
+
+class DeploymentModel(BaseModel):
+    """项目版本在各节点上的部署记录，用于按内容哈希跳过重复部署"""
+    __tablename__ = "deployment_model"
+    id = Column(Integer, primary_key=True)
+    server_url = Column(String(255), index=True)
+    project = Column(String(64), index=True)
+    version = Column(String(64))
+    egg_hash = Column(String(64))
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "server_url": self.server_url,
+            "project": self.project,
+            "version": self.version,
+            "egg_hash": self.egg_hash,
+            "created_time": self.created_time,
+        }
+
+
+class PeriodicScheduleModel(BaseModel):
+    """周期调度任务，cron表达式与固定间隔二选一"""
+    __tablename__ = "periodic_schedule_model"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64))
+    node_id = Column(Integer)  # 为空时使用默认节点
+    project = Column(String(64))
+    spider = Column(String(64))
+    settings = Column(Text)  # JSON格式的爬虫设置
+    cron = Column(String(64))
+    interval = Column(Integer)  # 间隔秒数
+    jitter = Column(Integer, default=0)  # 随机延迟上限(秒)
+    misfire_policy = Column(String(16), default="skip")
+    enable = Column(Integer, default=1)
+    last_run_time = Column(Integer)
+    next_run_time = Column(Integer, index=True)
+    updated_time = Column(Integer, index=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "node_id": self.node_id,
+            "project": self.project,
+            "spider": self.spider,
+            "settings": json.loads(self.settings) if self.settings else {},
+            "cron": self.cron,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "misfire_policy": self.misfire_policy,
+            "enable": self.enable,
+            "last_run_time": self.last_run_time,
+            "next_run_time": self.next_run_time,
+            "created_time": self.created_time,
+        }
@@ -1,3 +1,4 @@
+from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import Column, Integer, String
 from app.models.base import BaseModel
@@ -30,9 +31,14 @@ class UsersModel(BaseModel):
             "id": user.id,
             "username": user.nickname,
             "is_active": True,
-            "scope": "user"
+            "scope": UsersModel.scope_of(user.nickname)
         }
 
+    @staticmethod
+    def scope_of(username: str) -> str:
+        """用户的访问级别，ADMIN_USERS中的用户为admin，其余为user"""
+        return "admin" if username in current_app.config.get("ADMIN_USERS", ()) else "user"
+
     def check_password(self, raw_password: str) -> bool:
         if not self._password:
             return False
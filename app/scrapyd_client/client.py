@@ -1,26 +1,92 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+import asyncio
 import requests
 import json
 import logging
+import time
+import uuid
 from urllib.parse import urljoin
 from app.config.settings import SCRAPYD_URL
+from app.libs import metrics, recorder
+from app.scrapyd_client.singleflight import scrapyd_flight
+
+
+class MultipartStream:
+    """流式multipart/form-data请求体
+    
+    预先计算总长度以便设置Content-Length，文件内容在发送时按块读取
+    """
+    
+    chunk_size = 64 * 1024
+    
+    def __init__(self, fields: Dict[str, str], file_field: str, filename: str, fileobj: BinaryIO):
+        """初始化请求体
+        
+        Args:
+            fields (Dict[str, str]): 普通表单字段
+            file_field (str): 文件字段名
+            filename (str): 文件名
+            fileobj (BinaryIO): 文件对象，需支持seek和tell
+        """
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = b"".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            for name, value in fields.items()
+        )
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                 f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n').encode("utf-8")
+        self._head = head
+        self._tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self._file = fileobj
+        start = fileobj.tell()
+        fileobj.seek(0, 2)
+        self._file_size = fileobj.tell() - start
+        fileobj.seek(start)
+    
+    def __len__(self) -> int:
+        return len(self._head) + self._file_size + len(self._tail)
+    
+    def __iter__(self):
+        yield self._head
+        while True:
+            chunk = self._file.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield self._tail
 
 
 class ScrapydClient:
     """Scrapyd客户端类，用于与Scrapyd API交互"""
     
-    def __init__(self, target=SCRAPYD_URL):
+    def __init__(self, target=SCRAPYD_URL, name: Optional[str] = None,
+                 auth: Optional[Tuple[str, str]] = None, coalesce: bool = True):
         """初始化Scrapyd客户端
         
         Args:
             target (str, optional): Scrapyd服务URL. Defaults to SCRAPYD_URL.
+            name (Optional[str], optional): 节点名称. Defaults to None.
+            auth (Optional[Tuple[str, str]], optional): HTTP基本认证的用户名和密码. Defaults to None.
+            coalesce (bool, optional): 是否合并并发的相同GET请求. Defaults to True.
         """
         self.target = target.rstrip('/')
+        self.name = name or self.target
+        # 指标标签中使用节点名称，未命名的节点使用地址的哈希，不暴露节点地址
+        self.alias = name or metrics.node_alias(self.target)
+        self.auth = auth
+        self.coalesce = coalesce
         self.logger = logging.getLogger('ScrapydClient')
     
+    def _flight_key(self, endpoint: str, params: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (self.target, endpoint, tuple(sorted((k, str(v)) for k, v in params.items())))
+    
     def _request(self, endpoint: str, method: str = 'get', **kwargs) -> Dict[str, Any]:
         """发送请求到Scrapyd API
         
+        并发的相同GET请求(节点、端点和参数都相同)会合并为一次上游调用并共享解析后的结果，
+        调用方不应修改返回的对象
+        
         Args:
             endpoint (str): API端点
             method (str, optional): 请求方法. Defaults to 'get'.
@@ -32,12 +98,57 @@ class ScrapydClient:
         Raises:
             Exception: 请求失败时抛出异常
         """
+        if self.coalesce and method.lower() == 'get':
+            return scrapyd_flight.do(self._flight_key(endpoint, kwargs),
+                                     lambda: self._send(endpoint, method, kwargs))
+        return self._send(endpoint, method, kwargs)
+    
+    async def request_async(self, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """在asyncio任务中发送GET请求，与线程中的相同请求共享同一次上游调用
+        
+        Args:
+            endpoint (str): API端点
+            **kwargs: 请求参数
+            
+        Returns:
+            Dict[str, Any]: API响应
+        """
+        call = lambda: self._send(endpoint, 'get', kwargs)
+        if not self.coalesce:
+            return await asyncio.get_running_loop().run_in_executor(None, call)
+        return await scrapyd_flight.do_async(self._flight_key(endpoint, kwargs), call)
+    
+    def _send(self, endpoint: str, method: str, payload: Any,
+              headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """发送请求并解析响应
+        
+        Args:
+            endpoint (str): API端点
+            method (str): 请求方法
+            payload (Any): GET请求的查询参数，或POST请求的表单数据/流式请求体
+            headers (Optional[Dict[str, str]], optional): 额外的请求头. Defaults to None.
+            
+        Returns:
+            Dict[str, Any]: API响应
+        """
         url = urljoin(self.target, endpoint)
+        label = metrics.scrapyd_endpoint_label(endpoint)
+        in_flight = metrics.SCRAPYD_REQUESTS_IN_FLIGHT.labels(label, self.alias)
+        in_flight.inc()
+        status = "error"
+        start = time.perf_counter()
+        end = None
+        content = None
         try:
             if method.lower() == 'get':
-                response = requests.get(url, params=kwargs)
+                response = requests.get(url, params=payload, headers=headers, auth=self.auth)
             else:
-                response = requests.post(url, data=kwargs)
+                response = requests.post(url, data=payload, headers=headers, auth=self.auth)
+            # 只统计上游耗时，不包含后续的JSON解析
+            end = time.perf_counter()
+            status = str(response.status_code)
+            content = response.content
+            metrics.SCRAPYD_RESPONSE_SIZE.labels(label, self.alias).observe(len(content))
             
             if response.status_code != 200:
                 self.logger.error(f"API请求失败: {response.status_code} - {response.text}")
@@ -52,6 +163,57 @@ class ScrapydClient:
         except requests.RequestException as e:
             self.logger.error(f"请求异常: {str(e)}")
             return {"status": "error", "message": str(e)}
+        finally:
+            in_flight.dec()
+            duration = (end or time.perf_counter()) - start
+            metrics.SCRAPYD_REQUEST_DURATION.labels(label, self.alias, status).observe(duration)
+            recorder.record_upstream(method, endpoint, payload, status, duration,
+                                     len(content) if content is not None else 0, content)
+    
+    def iter_file(self, path: str, offset: int = 0, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """以流的方式读取Scrapyd上的日志或数据项文件
+        
+        Args:
+            path (str): 文件路径，如 logs/project/spider/job.log
+            offset (int, optional): 起始字节偏移，通过Range请求只读取新增部分. Defaults to 0.
+            chunk_size (int, optional): 读取块大小. Defaults to 64KB.
+            
+        Yields:
+            bytes: 文件内容块
+            
+        Raises:
+            requests.RequestException: 请求失败或状态码异常时抛出
+        """
+        url = urljoin(self.target, path)
+        label = metrics.scrapyd_endpoint_label(path)
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        status = "error"
+        size = 0
+        start = time.perf_counter()
+        try:
+            with requests.get(url, headers=headers, auth=self.auth, stream=True) as response:
+                status = str(response.status_code)
+                # 偏移已到文件末尾
+                if response.status_code == 416:
+                    return
+                response.raise_for_status()
+                # 服务端不支持Range时自行跳过已读取的部分
+                skip = offset if offset and response.status_code == 200 else 0
+                for chunk in response.iter_content(chunk_size):
+                    if skip:
+                        if len(chunk) <= skip:
+                            skip -= len(chunk)
+                            continue
+                        chunk = chunk[skip:]
+                        skip = 0
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            duration = time.perf_counter() - start
+            metrics.SCRAPYD_RESPONSE_SIZE.labels(label, self.alias).observe(size)
+            metrics.SCRAPYD_REQUEST_DURATION.labels(label, self.alias, status).observe(duration)
+            recorder.record_upstream('get', path, {"offset": offset} if offset else {}, status,
+                                     duration, size)
     
     def list_projects(self) -> List[str]:
         """列出爬虫项目
@@ -143,6 +305,43 @@ class ScrapydClient:
             return response['data']
         return str(response)
     
+    def iter_log(self, project: str, spider: str, job_id: str, log_type: str = 'log',
+                 offset: int = 0) -> Iterator[bytes]:
+        """以流的方式读取作业日志
+        
+        Args:
+            project (str): 项目名称
+            spider (str): 爬虫名称
+            job_id (str): 作业ID
+            log_type (str, optional): 日志类型 ('log' 或 'err'). Defaults to 'log'.
+            offset (int, optional): 起始字节偏移. Defaults to 0.
+            
+        Yields:
+            bytes: 日志内容块
+        """
+        return self.iter_file(f'logs/{project}/{spider}/{job_id}.{log_type}', offset)
+    
+    def iter_item_lines(self, project: str, spider: str, job_id: str) -> Iterator[bytes]:
+        """以流的方式逐行读取作业的数据项文件(JSON Lines)
+        
+        Args:
+            project (str): 项目名称
+            spider (str): 爬虫名称
+            job_id (str): 作业ID
+            
+        Yields:
+            bytes: 非空的数据项行
+        """
+        pending = b''
+        for chunk in self.iter_file(f'items/{project}/{spider}/{job_id}.jl'):
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield line
+        if pending.strip():
+            yield pending
+    
     def daemon_status(self) -> Dict[str, Any]:
         """获取Scrapyd守护进程状态
         
@@ -174,6 +373,22 @@ class ScrapydClient:
         """
         return self._request('delversion.json', 'post', project=project, version=version)
     
+    def add_version(self, project: str, version: str, egg: BinaryIO) -> Dict[str, Any]:
+        """上传项目版本
+        
+        请求体以流的方式从egg文件读取，不会把整个egg载入内存
+        
+        Args:
+            project (str): 项目名称
+            version (str): 版本号
+            egg (BinaryIO): 以二进制方式打开的egg文件
+            
+        Returns:
+            Dict[str, Any]: 操作结果
+        """
+        body = MultipartStream({"project": project, "version": version}, "egg", f"{project}.egg", egg)
+        return self._send('addversion.json', 'post', body, {"Content-Type": body.content_type})
+    
     def list_versions(self, project: str) -> List[str]:
         """列出项目版本
         
@@ -0,0 +1,216 @@
+"""多节点Scrapyd集群操作
+
+节点来自ScrapydModel中已启用的记录，未配置任何节点时退回默认客户端。
+"""
+import hashlib
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from app.libs import recorder
+from app.models.base import db
+from app.models.scrapyd import DeploymentModel, ScrapydModel
+from app.scrapyd_client.client import ScrapydClient, client
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def get_clients(node_ids: Optional[Iterable[int]] = None) -> List[ScrapydClient]:
+    """获取节点客户端列表
+
+    Args:
+        node_ids (Optional[Iterable[int]], optional): 节点ID列表，为空时返回所有已启用节点. Defaults to None.
+
+    Returns:
+        List[ScrapydClient]: 节点客户端列表
+    """
+    query = ScrapydModel.query.filter(ScrapydModel.enable == 1, ScrapydModel.status == 1)
+    if node_ids:
+        query = query.filter(ScrapydModel.id.in_(list(node_ids)))
+    nodes = query.all()
+    if not nodes and not node_ids:
+        return [client]
+    # 同一地址可能被登记为多个节点，每个地址只返回一个客户端，避免重复部署或取消
+    clients: Dict[str, ScrapydClient] = {}
+    for node in nodes:
+        url = node.server_url.rstrip("/")
+        if url not in clients:
+            clients[url] = ScrapydClient(url, name=node.server_name,
+                                         auth=(node.username, node.password) if node.username else None)
+    return list(clients.values())
+
+
+def run_concurrently(func: Callable[[T], R], items: List[T], max_workers: int) -> List[Dict[str, Any]]:
+    """以有限并发对每个元素执行func
+
+    Args:
+        func (Callable[[T], R]): 执行函数
+        items (List[T]): 待处理元素
+        max_workers (int): 最大并发数
+
+    Returns:
+        List[Dict[str, Any]]: 与items顺序一致的结果，成功为{"ok": True, "result": ...}，
+            失败为{"ok": False, "error": "..."}
+    """
+    def call(item: T) -> Dict[str, Any]:
+        try:
+            return {"ok": True, "result": func(item)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    if not items:
+        return []
+    call = recorder.propagate(call)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(call, items))
+
+
+def store_egg(stream: BinaryIO, directory: str, chunk_size: int = 64 * 1024) -> Tuple[str, str]:
+    """将上传的egg按内容哈希保存到本地，相同内容只保存一份
+
+    Args:
+        stream (BinaryIO): 上传文件流
+        directory (str): 存储目录
+        chunk_size (int, optional): 读取块大小. Defaults to 64KB.
+
+    Returns:
+        Tuple[str, str]: egg的sha256哈希与本地路径
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}")
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        egg_hash = digest.hexdigest()
+        path = os.path.join(directory, f"{egg_hash}.egg")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return egg_hash, path
+
+
+def deploy(project: str, version: str, egg_hash: str, egg_path: str,
+           clients: List[ScrapydClient], max_workers: int, force: bool = False) -> List[Dict[str, Any]]:
+    """并发地将egg部署到多个节点
+
+    节点上已用相同内容部署过同名版本且该版本仍然存在时跳过上传，
+    内容相同但版本号不同时仍会以新版本号上传，保证请求的版本在每个节点上都存在
+
+    Args:
+        project (str): 项目名称
+        version (str): 版本号
+        egg_hash (str): egg内容哈希
+        egg_path (str): egg本地路径
+        clients (List[ScrapydClient]): 目标节点
+        max_workers (int): 最大并发数
+        force (bool, optional): 是否忽略去重强制上传. Defaults to False.
+
+    Returns:
+        List[Dict[str, Any]]: 每个节点的部署结果
+    """
+    # 在请求线程中查询已部署过相同内容与版本的节点，工作线程只做HTTP请求
+    deployed: Set[str] = set()
+    if not force:
+        deployed = {record.server_url for record in DeploymentModel.query.filter(
+            DeploymentModel.project == project,
+            DeploymentModel.version == version,
+            DeploymentModel.egg_hash == egg_hash,
+            DeploymentModel.server_url.in_([c.target for c in clients])
+        )}
+
+    def push(node: ScrapydClient) -> Dict[str, Any]:
+        # 版本可能已在节点上被删除，确认仍存在后才跳过
+        if node.target in deployed and version in node.list_versions(project):
+            return {"status": "skipped", "version": version}
+        with open(egg_path, "rb") as egg:
+            response = node.add_version(project, version, egg)
+        if response.get("status") != "ok":
+            return {"status": "error", "message": response.get("message", "部署失败")}
+        return {"status": "deployed", "version": version, "spiders": response.get("spiders")}
+
+    results = []
+    for node, outcome in zip(clients, run_concurrently(push, clients, max_workers)):
+        result = outcome["result"] if outcome["ok"] else {"status": "error", "message": outcome["error"]}
+        results.append({"node": node.name, "server_url": node.target, **result})
+    return results
+
+
+def bulk_cancel(project: str, clients: List[ScrapydClient], max_workers: int,
+                spider: Optional[str] = None, states: Iterable[str] = ("pending", "running"),
+                job_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """在所有节点上批量取消匹配的作业
+
+    先并发获取各节点的作业列表并筛选，再以有限并发调用cancel.json
+
+    Args:
+        project (str): 项目名称
+        clients (List[ScrapydClient]): 目标节点
+        max_workers (int): 最大并发数
+        spider (Optional[str], optional): 只取消该爬虫的作业. Defaults to None.
+        states (Iterable[str], optional): 要取消的作业状态. Defaults to ("pending", "running").
+        job_ids (Optional[Iterable[str]], optional): 只取消这些作业. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: 匹配数量、已取消与失败的作业列表
+    """
+    states = tuple(states)
+    wanted = set(job_ids) if job_ids else None
+
+    def collect(node: ScrapydClient) -> Dict[str, Any]:
+        # 直接使用原始响应，以便区分节点不可用与没有作业
+        return node._request('listjobs.json', project=project)
+
+    matched = []
+    failed = []
+    for node, outcome in zip(clients, run_concurrently(collect, clients, max_workers)):
+        response = outcome["result"] if outcome["ok"] else {"status": "error", "message": outcome["error"]}
+        if response.get("status") != "ok":
+            failed.append({"node": node.name, "job_id": None, "message": response.get("message", "获取作业列表失败")})
+            continue
+        for state in states:
+            for job in response.get(state, []):
+                if spider and job.get("spider") != spider:
+                    continue
+                if wanted is not None and job.get("id") not in wanted:
+                    continue
+                matched.append((node, state, job))
+
+    def cancel(entry) -> Dict[str, Any]:
+        node, _, job = entry
+        return node.cancel(project, job["id"])
+
+    cancelled = []
+    for (node, state, job), outcome in zip(matched, run_concurrently(cancel, matched, max_workers)):
+        response = outcome["result"] if outcome["ok"] else {"status": "error", "message": outcome["error"]}
+        entry = {"node": node.name, "job_id": job.get("id"), "spider": job.get("spider"), "state": state}
+        if response.get("status") == "ok":
+            cancelled.append({**entry, "prevstate": response.get("prevstate")})
+        else:
+            failed.append({**entry, "message": response.get("message", "取消失败")})
+
+    return {"matched": len(matched), "cancelled": cancelled, "failed": failed}
+
+
+def record_deployments(project: str, egg_hash: str, results: List[Dict[str, Any]]) -> None:
+    """保存部署成功的节点记录，供下次部署去重"""
+    records = []
+    for result in results:
+        if result["status"] != "deployed":
+            continue
+        record = DeploymentModel()
+        record.set_attrs({"server_url": result["server_url"], "project": project,
+                          "version": result["version"], "egg_hash": egg_hash})
+        records.append(record)
+    if records:
+        with db.auto_commit():
+            db.session.add_all(records)
@@ -0,0 +1,125 @@
+"""跨作业的数据项增量对比
+
+流式读取两次运行的数据项，逐项计算键指纹与内容指纹，内存中只保留指纹，
+不保留解析后的数据项。
+"""
+import hashlib
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+MISSING = object()
+
+# 字段按名称排序后编码，保证字段顺序不同的相同数据项得到相同指纹
+_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _digest(value: Any) -> int:
+    data = _encoder.encode(value).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class ItemFingerprinter:
+    """计算数据项的键指纹与内容指纹
+
+    Args:
+        key_fields: 组成数据项唯一键的字段
+        ignore_fields: 计算内容指纹时忽略的字段，如抓取时间
+    """
+
+    def __init__(self, key_fields: Sequence[str], ignore_fields: Iterable[str] = ()) -> None:
+        if not key_fields:
+            raise ValueError("至少需要一个键字段")
+        self.key_fields = tuple(key_fields)
+        self.ignore_fields = frozenset(ignore_fields)
+
+    def key(self, item: Dict[str, Any]) -> Any:
+        """数据项的键值，单个键字段时为字段值，否则为字段值列表"""
+        if len(self.key_fields) == 1:
+            return item.get(self.key_fields[0])
+        return [item.get(f) for f in self.key_fields]
+
+    def fingerprint(self, line: bytes) -> Optional[Tuple[int, int, Any]]:
+        """解析一行数据项并计算指纹
+
+        Returns:
+            Optional[Tuple[int, int, Any]]: 键指纹、内容指纹与键值，无法解析时返回None
+        """
+        try:
+            item = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(item, dict):
+            return None
+        key = self.key(item)
+        if self.ignore_fields:
+            item = {k: v for k, v in item.items() if k not in self.ignore_fields}
+        return _digest(key), _digest(item), key
+
+
+def diff_items(base_lines: Callable[[], Iterable[bytes]], new_lines: Iterable[bytes],
+               fingerprinter: ItemFingerprinter, limit: int = 1000) -> Dict[str, Any]:
+    """对比两次运行的数据项
+
+    基准作业的数据项只保存为 键指纹->内容指纹 的映射。被删除数据项的键值需要原文，
+    因此存在删除时会再流式读取一次基准作业，只取出被删除的键
+
+    Args:
+        base_lines: 返回基准作业数据项行的函数，可能被调用两次
+        new_lines: 新作业的数据项行
+        fingerprinter: 指纹计算器
+        limit: 每类结果最多返回的键数量
+
+    Returns:
+        Dict[str, Any]: 新增、删除、变更的键及各类数量
+    """
+    counts = {"base": 0, "new": 0, "added": 0, "removed": 0, "changed": 0,
+              "unchanged": 0, "invalid": 0, "duplicate": 0}
+
+    base: Dict[int, int] = {}
+    for line in base_lines():
+        fp = fingerprinter.fingerprint(line)
+        if fp is None:
+            counts["invalid"] += 1
+            continue
+        counts["base"] += 1
+        base[fp[0]] = fp[1]
+
+    added: List[Any] = []
+    changed: List[Any] = []
+    seen: Set[int] = set()
+    for line in new_lines:
+        fp = fingerprinter.fingerprint(line)
+        if fp is None:
+            counts["invalid"] += 1
+            continue
+        counts["new"] += 1
+        key_fp, content_fp, key = fp
+        if key_fp in seen:
+            counts["duplicate"] += 1
+            continue
+        seen.add(key_fp)
+        old = base.pop(key_fp, MISSING)
+        if old is MISSING:
+            counts["added"] += 1
+            if len(added) < limit:
+                added.append(key)
+        elif old != content_fp:
+            counts["changed"] += 1
+            if len(changed) < limit:
+                changed.append(key)
+        else:
+            counts["unchanged"] += 1
+    del seen
+
+    # base中剩余的即为被删除的数据项
+    counts["removed"] = len(base)
+    removed: List[Any] = []
+    if base and limit:
+        for line in base_lines():
+            fp = fingerprinter.fingerprint(line)
+            if fp is not None and base.pop(fp[0], MISSING) is not MISSING:
+                removed.append(fp[2])
+                if len(removed) >= limit or not base:
+                    break
+
+    return {"added": added, "removed": removed, "changed": changed, "counts": counts}
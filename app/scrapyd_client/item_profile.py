@@ -0,0 +1,145 @@
+"""数据项字段质量画像
+
+单遍流式读取作业的数据项，按顶层字段统计出现率、类型分布、近似不同值数量、
+数值与长度的近似分位数以及高频值。每个字段只保留固定大小的草图，内存与数据项数量无关；
+字段数量超过上限后新字段不再统计。
+"""
+import json
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from app.libs.sketches import HyperLogLog, QuantileSketch, SpaceSaving
+
+QUANTILES = (0.5, 0.9, 0.99)
+# 高频值中字符串最多保留的字符数
+TOP_VALUE_LENGTH = 100
+
+_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+# json.loads只会产生这些类型
+TYPE_NAMES = {
+    str: "string",
+    int: "integer",
+    float: "float",
+    bool: "boolean",
+    type(None): "null",
+    list: "array",
+    dict: "object",
+}
+
+
+def _distinct_key(type_name: str, value: Any) -> bytes:
+    """不同值统计使用的字节表示，带类型前缀，数值1与1.0视为同一个值"""
+    if type_name == "string":
+        return b"s:" + value.encode("utf-8", "surrogatepass")
+    if type_name == "float" and value.is_integer():
+        value = int(value)
+        type_name = "integer"
+    if type_name == "integer":
+        return b"n:" + str(value).encode("ascii")
+    if type_name == "float":
+        return b"n:" + repr(value).encode("ascii")
+    return type_name.encode("ascii") + b":" + _encoder.encode(value).encode("utf-8")
+
+
+class FieldProfile:
+    """单个字段的统计"""
+
+    __slots__ = ("present", "types", "distinct", "values", "lengths", "top")
+
+    def __init__(self, top_capacity: int) -> None:
+        self.present = 0
+        self.types: Dict[str, int] = {}
+        self.distinct = HyperLogLog()
+        self.values = QuantileSketch()
+        self.lengths = QuantileSketch()
+        self.top = SpaceSaving(top_capacity)
+
+    def add(self, value: Any) -> None:
+        self.present += 1
+        type_name = TYPE_NAMES.get(type(value), "object")
+        self.types[type_name] = self.types.get(type_name, 0) + 1
+        self.distinct.add(_distinct_key(type_name, value))
+        if type_name == "string":
+            self.lengths.add(len(value))
+            self.top.add(value[:TOP_VALUE_LENGTH])
+        elif type_name == "integer" or type_name == "float":
+            self.values.add(value)
+            # 非字符串的值带上类型，避免True与1、1与"1"被视为同一个值
+            self.top.add((type_name, value))
+        elif type_name == "boolean" or type_name == "null":
+            self.top.add((type_name, value))
+        else:
+            self.lengths.add(len(value))
+
+    def report(self, total: int, top: int) -> Dict[str, Any]:
+        return {
+            "presence": self.present / total if total else 0.0,
+            "count": self.present,
+            "types": self.types,
+            "distinct": min(self.distinct.count(), self.present),
+            "value": _summary(self.values),
+            "length": _summary(self.lengths),
+            "top": [
+                {"value": key[1] if isinstance(key, tuple) else key, "count": count, "error": error}
+                for key, count, error in self.top.top(top)
+                # 扣除继承的计数后只出现过一次的候选不能说明它是高频值
+                if count - error > 1
+            ],
+        }
+
+
+def _summary(sketch: QuantileSketch) -> Optional[Dict[str, Any]]:
+    if not sketch.count:
+        return None
+    result: Dict[str, Any] = {"min": sketch.min, "max": sketch.max}
+    for q, value in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        result[f"p{int(q * 100)}"] = value
+    return result
+
+
+def profile_items(lines: Iterable[bytes], top: int = 10, max_fields: int = 200) -> Dict[str, Any]:
+    """统计数据项各字段的质量画像
+
+    Args:
+        lines (Iterable[bytes]): JSON Lines格式的数据项行
+        top (int, optional): 每个字段返回的高频值数量. Defaults to 10.
+        max_fields (int, optional): 最多统计的字段数. Defaults to 200.
+
+    Returns:
+        Dict[str, Any]: 数据项总数、无法解析的行数、未统计的字段数(最多计到max_fields)以及各字段画像
+    """
+    fields: Dict[Hashable, FieldProfile] = {}
+    # 跟踪的候选值多于返回数量，减少高频值被替换造成的误差
+    capacity = max(top * 4, 32)
+    total = invalid = 0
+    skipped: set = set()
+    for line in lines:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            invalid += 1
+            continue
+        if not isinstance(item, dict):
+            invalid += 1
+            continue
+        total += 1
+        for name, value in item.items():
+            profile = fields.get(name)
+            if profile is None:
+                if len(fields) >= max_fields:
+                    if len(skipped) < max_fields:
+                        skipped.add(name)
+                    continue
+                profile = fields[name] = FieldProfile(capacity)
+            profile.add(value)
+
+    field_reports: List[Dict[str, Any]] = []
+    for name, profile in sorted(fields.items(), key=lambda kv: -kv[1].present):
+        field_reports.append({"field": name, **profile.report(total, top)})
+    return {
+        "items": total,
+        "invalid_lines": invalid,
+        "skipped_fields": len(skipped),
+        "fields": field_reports,
+    }
@@ -0,0 +1,194 @@
+"""作业列表的服务端筛选、排序与游标分页
+
+每次从Scrapyd获取的作业列表会预先按(爬虫, 状态)分桶，并在桶内按时间排序。
+查询时只需选中相关的桶，用二分查找定位时间范围和游标位置，再归并取出一页，
+不需要每次都扫描完整列表。
+"""
+import base64
+import heapq
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Flask
+
+from app.libs.cache import LRUCache
+from app.scrapyd_client.client import ScrapydClient
+
+STATUSES = ("pending", "running", "finished")
+SORT_FIELDS = ("start_time", "end_time")
+# 没有对应时间的作业(如pending作业没有start_time)视为最新
+MISSING_TIME = float("inf")
+
+Key = Tuple[float, str]
+
+
+def parse_time(value: Optional[str]) -> float:
+    """将Scrapyd的时间字符串或时间戳转换为时间戳，无法解析时返回MISSING_TIME"""
+    if not value:
+        return MISSING_TIME
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return MISSING_TIME
+
+
+def encode_cursor(key: Key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Key:
+    """解析游标
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        ts, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(ts), str(job_id)
+    except Exception:
+        raise ValueError("游标格式错误")
+
+
+class _Bucket:
+    """同一爬虫、同一状态的作业，按排序字段升序排列"""
+
+    __slots__ = ("keys", "jobs")
+
+    def __init__(self, entries: List[Tuple[Key, Dict[str, Any]]]) -> None:
+        entries.sort(key=lambda e: e[0])
+        self.keys = [e[0] for e in entries]
+        self.jobs = [e[1] for e in entries]
+
+    def range(self, low: Key, high: Key) -> Tuple[int, int]:
+        """返回键在[low, high]之间的下标范围"""
+        return bisect_left(self.keys, low), bisect_right(self.keys, high)
+
+
+class JobIndex:
+    """一次listjobs结果的分桶索引"""
+
+    def __init__(self, jobs: Dict[str, List[Dict[str, Any]]]) -> None:
+        self.source = tuple(jobs.get(status, []) for status in STATUSES)
+        self._buckets: Dict[str, Dict[Tuple[str, str], _Bucket]] = {}
+        self._lock = threading.Lock()
+
+    def buckets(self, sort: str) -> Dict[Tuple[str, str], _Bucket]:
+        """按排序字段获取分桶，首次使用时构建"""
+        buckets = self._buckets.get(sort)
+        if buckets is None:
+            with self._lock:
+                buckets = self._buckets.get(sort)
+                if buckets is None:
+                    buckets = self._buckets[sort] = self._build(sort)
+        return buckets
+
+    def _build(self, sort: str) -> Dict[Tuple[str, str], _Bucket]:
+        grouped: Dict[Tuple[str, str], List[Tuple[Key, Dict[str, Any]]]] = {}
+        for status, jobs in zip(STATUSES, self.source):
+            for job in jobs:
+                spider = job.get("spider", "")
+                key = (parse_time(job.get(sort)), str(job.get("id", "")))
+                grouped.setdefault((spider, status), []).append((key, job))
+        return {k: _Bucket(v) for k, v in grouped.items()}
+
+    def query(self, spiders: Optional[Sequence[str]] = None, statuses: Optional[Sequence[str]] = None,
+              since: Optional[float] = None, until: Optional[float] = None, sort: str = "start_time",
+              order: str = "desc", limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """筛选并返回一页作业
+
+        Args:
+            spiders: 只返回这些爬虫的作业
+            statuses: 只返回这些状态的作业
+            since: 排序字段的起始时间戳(含)
+            until: 排序字段的结束时间戳(含)
+            sort: 排序字段，start_time或end_time
+            order: asc或desc
+            limit: 每页数量
+            cursor: 上一页返回的游标
+
+        Returns:
+            Dict[str, Any]: 本页作业、下一页游标与符合条件的总数
+        """
+        buckets = self.buckets(sort)
+        descending = order == "desc"
+        low: Key = (since if since is not None else float("-inf"), "")
+        high: Key = (until if until is not None else MISSING_TIME, "\U0010ffff")
+
+        selected = [
+            (status, bucket) for (spider, status), bucket in buckets.items()
+            if (not spiders or spider in spiders) and (not statuses or status in statuses)
+        ]
+
+        total = 0
+        streams: List[Iterator[Tuple[Key, str, Dict[str, Any]]]] = []
+        position = decode_cursor(cursor) if cursor else None
+        for status, bucket in selected:
+            start, end = bucket.range(low, high)
+            total += end - start
+            # 游标之后的部分，游标本身已在上一页返回
+            if position is not None:
+                if descending:
+                    end = min(end, bisect_left(bucket.keys, position))
+                else:
+                    start = max(start, bisect_right(bucket.keys, position))
+            if start < end:
+                streams.append(self._stream(bucket, status, start, end, descending))
+
+        merged = heapq.merge(*streams, key=lambda e: e[0], reverse=descending)
+        page = list(islice(merged, limit + 1))
+        next_cursor = encode_cursor(page[limit - 1][0]) if len(page) > limit and limit > 0 else None
+        return {
+            "jobs": [{**job, "status": status} for _, status, job in page[:limit]],
+            "next_cursor": next_cursor,
+            "total": total,
+        }
+
+    @staticmethod
+    def _stream(bucket: _Bucket, status: str, start: int, end: int,
+                descending: bool) -> Iterator[Tuple[Key, str, Dict[str, Any]]]:
+        indexes: Iterable[int] = range(end - 1, start - 1, -1) if descending else range(start, end)
+        for i in indexes:
+            yield bucket.keys[i], status, bucket.jobs[i]
+
+
+class JobIndexCache:
+    """按(节点, 项目)缓存作业列表的索引
+
+    索引在短时间内复用，同一查询的各页游标请求只获取一次作业列表、构建一次索引；
+    本进程调度或取消作业后立即失效，其他来源的变化最多延迟ttl秒可见
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 5.0) -> None:
+        self._cache = LRUCache("job_index", maxsize, ttl)
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        self._cache.configure(maxsize, ttl)
+
+    def get(self, node: ScrapydClient, project: str) -> JobIndex:
+        key = (node.target, project)
+        index = self._cache.get(key)
+        if index is None:
+            index = JobIndex(node.list_jobs(project))
+            self._cache.set(key, index)
+        return index
+
+    def invalidate(self, node: ScrapydClient, project: str) -> None:
+        """丢弃节点上项目的索引，下次查询重新获取作业列表"""
+        self._cache.invalidate((node.target, project))
+
+
+job_indexes = JobIndexCache()
+
+
+def init_app(app: Flask) -> None:
+    """按配置设置作业索引缓存"""
+    job_indexes.configure(app.config.get("JOB_INDEX_CACHE_SIZE", 256),
+                          app.config.get("JOB_INDEX_TTL", 5.0))
@@ -0,0 +1,246 @@
+"""作业日志本地压缩归档
+
+Scrapyd会按jobs_to_keep轮转删除日志，归档后日志可以永久保留，并且重复读取不再经过Scrapyd。
+
+归档文件格式(小端序):
+
+    头部    magic(8) block_size(u32)
+    数据块  每块为block_size字节原文的zlib压缩结果，最后一块可以更短
+    索引    每块一项: 压缩数据偏移(u64) 压缩数据长度(u32)
+    尾部    索引偏移(u64) 块数量(u32) 原文总长度(u64) magic(8)
+
+除最后一块外每块原文长度固定，因此任意偏移所在的块可以直接计算得到，
+读取时通过mmap只解压覆盖请求范围的块。
+"""
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from flask import Flask, current_app
+
+from app.scrapyd_client.client import ScrapydClient
+
+MAGIC = b"WSLOGZ01"
+HEADER = struct.Struct("<8sI")
+INDEX_ENTRY = struct.Struct("<QI")
+FOOTER = struct.Struct("<QIQ8s")
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+
+class ArchiveFormatError(ValueError):
+    """归档文件损坏或格式不正确"""
+
+
+def write_archive(path: str, chunks: Iterable[bytes], block_size: int = DEFAULT_BLOCK_SIZE,
+                  level: int = 6) -> int:
+    """将内容块写入归档文件
+
+    先写入临时文件，完成后原子替换，读者不会看到写了一半的归档
+
+    Args:
+        path (str): 归档文件路径
+        chunks (Iterable[bytes]): 原文内容块
+        block_size (int, optional): 压缩块大小. Defaults to 256KB.
+        level (int, optional): zlib压缩级别. Defaults to 6.
+
+    Returns:
+        int: 原文总长度
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    index: List[bytes] = []
+    total = 0
+    buffer = bytearray()
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, block_size))
+
+            def flush(block: bytes) -> None:
+                data = zlib.compress(block, level)
+                index.append(INDEX_ENTRY.pack(f.tell(), len(data)))
+                f.write(data)
+
+            for chunk in chunks:
+                buffer += chunk
+                total += len(chunk)
+                while len(buffer) >= block_size:
+                    flush(bytes(buffer[:block_size]))
+                    del buffer[:block_size]
+            if buffer:
+                flush(bytes(buffer))
+
+            index_offset = f.tell()
+            f.write(b"".join(index))
+            f.write(FOOTER.pack(index_offset, len(index), total, MAGIC))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return total
+
+
+class ArchiveReader:
+    """通过mmap随机读取归档文件"""
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ArchiveFormatError(f"归档文件为空: {path}")
+        try:
+            self._parse()
+        except (struct.error, ArchiveFormatError):
+            self.close()
+            raise ArchiveFormatError(f"归档文件格式错误: {path}")
+
+    def _parse(self) -> None:
+        magic, self.block_size = HEADER.unpack_from(self._map, 0)
+        index_offset, self.block_count, self.size, tail_magic = FOOTER.unpack_from(
+            self._map, len(self._map) - FOOTER.size)
+        if magic != MAGIC or tail_magic != MAGIC:
+            raise ArchiveFormatError()
+        self._index_offset = index_offset
+
+    def _block(self, number: int) -> bytes:
+        offset, length = INDEX_ENTRY.unpack_from(self._map, self._index_offset + number * INDEX_ENTRY.size)
+        return zlib.decompress(self._map[offset:offset + length])
+
+    def read(self, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """读取原文中的一段字节
+
+        Args:
+            offset (int, optional): 起始偏移. Defaults to 0.
+            length (Optional[int], optional): 读取长度，为空时读到末尾. Defaults to None.
+
+        Returns:
+            bytes: 原文内容
+        """
+        offset = max(0, offset)
+        end = self.size if length is None else min(self.size, offset + max(0, length))
+        if offset >= end:
+            return b""
+        first = offset // self.block_size
+        last = (end - 1) // self.block_size
+        data = b"".join(self._block(n) for n in range(first, last + 1))
+        start = offset - first * self.block_size
+        return data[start:start + end - offset]
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _safe_component(value: str) -> bool:
+    return bool(value) and value not in (".", "..") and "/" not in value and "\\" not in value
+
+
+class LogArchive:
+    """按项目/爬虫/作业组织的日志归档目录"""
+
+    def __init__(self, root: str, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        self.root = root
+        self.block_size = block_size
+        # 路径 -> [锁, 持有或等待该锁的线程数]
+        self._locks: Dict[str, List[Any]] = {}
+        self._locks_guard = threading.Lock()
+
+    def path(self, project: str, spider: str, job_id: str, log_type: str = "log") -> Optional[str]:
+        """获取归档文件路径，参数不合法时返回None"""
+        if not all(_safe_component(v) for v in (project, spider, job_id, log_type)):
+            return None
+        return os.path.join(self.root, project, spider, f"{job_id}.{log_type}.z")
+
+    def has(self, project: str, spider: str, job_id: str, log_type: str = "log") -> bool:
+        path = self.path(project, spider, job_id, log_type)
+        return path is not None and os.path.exists(path)
+
+    def open(self, project: str, spider: str, job_id: str, log_type: str = "log") -> Optional[ArchiveReader]:
+        """打开已归档的日志，未归档时返回None"""
+        path = self.path(project, spider, job_id, log_type)
+        if path is None or not os.path.exists(path):
+            return None
+        return ArchiveReader(path)
+
+    @contextmanager
+    def _path_lock(self, path: str) -> Iterator[None]:
+        """按路径加锁，最后一个持有或等待者离开时才移除锁，避免并发请求拿到不同的锁"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[path]
+
+    def archive(self, node: ScrapydClient, project: str, spider: str, job_id: str,
+                log_type: str = "log") -> bool:
+        """从Scrapyd拉取日志并归档，已归档时直接返回
+
+        Args:
+            node (ScrapydClient): 作业所在节点
+            project (str): 项目名称
+            spider (str): 爬虫名称
+            job_id (str): 作业ID
+            log_type (str, optional): 日志类型. Defaults to 'log'.
+
+        Returns:
+            bool: 本次是否新归档了日志
+        """
+        path = self.path(project, spider, job_id, log_type)
+        if path is None:
+            raise ValueError("非法的日志路径参数")
+        # 同一作业的并发请求只拉取一次
+        with self._path_lock(path):
+            if os.path.exists(path):
+                return False
+            write_archive(path, node.iter_log(project, spider, job_id, log_type), self.block_size)
+        return True
+
+    def archive_finished(self, node: ScrapydClient, project: str) -> Dict[str, Any]:
+        """归档项目下所有已完成且尚未归档的作业日志
+
+        Returns:
+            Dict[str, Any]: 新归档、已存在与失败的作业
+        """
+        result: Dict[str, Any] = {"archived": [], "skipped": 0, "failed": []}
+        for job in node.list_jobs(project)["finished"]:
+            spider, job_id = job.get("spider"), job.get("id")
+            if self.has(project, spider, job_id):
+                result["skipped"] += 1
+                continue
+            try:
+                self.archive(node, project, spider, job_id)
+                result["archived"].append(job_id)
+            except Exception as e:
+                result["failed"].append({"job_id": job_id, "message": str(e)})
+        return result
+
+
+def get_archive() -> LogArchive:
+    """获取当前应用的日志归档"""
+    return current_app.extensions["log_archive"]
+
+
+def init_app(app: Flask) -> None:
+    """注册日志归档"""
+    app.extensions["log_archive"] = LogArchive(
+        app.config.get("LOG_ARCHIVE_DIR", "log_archive"),
+        app.config.get("LOG_ARCHIVE_BLOCK_SIZE", DEFAULT_BLOCK_SIZE))
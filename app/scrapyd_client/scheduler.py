@@ -0,0 +1,356 @@
+"""周期调度
+
+周期任务保存在PeriodicScheduleModel中，调度线程用最小堆按下一次触发时间维护全部定时器，
+每轮只查看堆顶，增删定时器的开销为O(log n)。任务修改或删除时不在堆中查找旧条目，
+而是更换定时器版本，旧条目弹出时因版本不匹配被丢弃。
+
+触发时间会加上[0, jitter]秒的随机延迟，避免大量任务在同一分钟内同时触发；
+调度请求先经过令牌桶限速，再交给线程池通过ScrapydClient.schedule发出。
+
+停机或积压导致错过触发时按misfire_policy处理:
+    skip     跳过错过的触发，从当前时间起计算下一次
+    once     合并为立即触发一次
+    catchup  依次补触发错过的每一次，最多SCHEDULER_MAX_CATCHUP次
+
+同一时刻只应有一个进程运行调度线程。其他进程修改任务时只写数据库，
+调度线程按updated_time增量同步。
+"""
+import atexit
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from flask import Flask
+from sqlalchemy import update
+
+from app.libs import metrics
+from app.libs.audit import audit
+from app.libs.cron import CronExpression
+from app.models.base import db
+from app.models.scrapyd import PeriodicScheduleModel
+from app.scrapyd_client.client import ScrapydClient, client
+from app.scrapyd_client.cluster import get_clients
+
+MISFIRE_POLICIES = ("skip", "once", "catchup")
+
+SCHEDULER_FIRES = metrics.registry.register(metrics.Counter(
+    "webspider_scheduler_fires_total", "周期任务触发次数", ("result",)))
+SCHEDULER_TIMERS = metrics.registry.register(metrics.Gauge(
+    "webspider_scheduler_timers", "已加载的周期任务数量"))
+SCHEDULER_LAG = metrics.registry.register(metrics.Histogram(
+    "webspider_scheduler_lag_seconds", "实际发起调度相对计划时间的延迟"))
+
+logger = logging.getLogger(__name__)
+
+Trigger = Union[CronExpression, int]
+# (触发时间, 序号, 任务ID, 定时器版本, 计划时间)
+HeapEntry = Tuple[float, int, int, int, float]
+
+
+def make_trigger(cron: Optional[str], interval: Optional[Any]) -> Trigger:
+    """根据cron表达式或间隔秒数创建触发器
+
+    Raises:
+        ValueError: 参数错误，或cron表达式永远不会触发
+    """
+    if bool(cron) == (interval is not None and interval != ""):
+        raise ValueError("cron与interval必须且只能指定一个")
+    if cron:
+        trigger = CronExpression(cron)
+        trigger.next_after(datetime.now())
+        return trigger
+    try:
+        seconds = int(interval)
+    except (TypeError, ValueError):
+        raise ValueError("interval必须是整数秒")
+    if seconds <= 0:
+        raise ValueError("interval必须大于0")
+    return seconds
+
+
+class _Timer:
+    """内存中的周期任务，由调度线程独占"""
+
+    __slots__ = ("id", "version", "signature", "node", "project", "spider", "settings",
+                 "trigger", "anchor", "jitter", "policy", "backlog")
+
+    def __init__(self, row: PeriodicScheduleModel, version: int, signature: Tuple[Any, ...],
+                 node: ScrapydClient) -> None:
+        self.id = row.id
+        self.version = version
+        self.signature = signature
+        self.node = node
+        self.project = row.project
+        self.spider = row.spider
+        self.settings = json.loads(row.settings) if row.settings else {}
+        self.trigger = make_trigger(row.cron, row.interval)
+        # 固定间隔任务以创建时间为基准对齐，重启后触发时间不漂移
+        self.anchor = float(row.created_time or 0)
+        self.jitter = max(0, row.jitter or 0)
+        self.policy = row.misfire_policy if row.misfire_policy in MISFIRE_POLICIES else "skip"
+        self.backlog = 0
+
+    def next_fire(self, after: float) -> float:
+        """严格晚于after的下一次计划触发时间"""
+        if isinstance(self.trigger, CronExpression):
+            return self.trigger.next_after(datetime.fromtimestamp(after)).timestamp()
+        elapsed = max(0.0, after - self.anchor)
+        return self.anchor + (elapsed // self.trigger + 1) * self.trigger
+
+
+class PeriodicScheduler:
+    """周期任务调度器"""
+
+    def __init__(self) -> None:
+        self.app: Optional[Flask] = None
+        self.rate = 20.0
+        self.burst = 50
+        self.max_workers = 8
+        self.misfire_grace = 60
+        self.max_catchup = 10
+        self.sync_interval = 30.0
+        self.persist_interval = 2.0
+        self._heap: List[HeapEntry] = []
+        self._timers: Dict[int, _Timer] = {}
+        self._seq = itertools.count()
+        self._versions = itertools.count(1)
+        self._cond = threading.Condition()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._sync_requested = False
+        self._synced_at = 0
+        self._next_sync = 0.0
+        self._next_persist = 0.0
+        self._tokens = 0.0
+        self._token_time = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        """绑定应用并读取配置，开启SCHEDULER_ENABLED时在首个请求到来时启动调度线程"""
+        self.app = app
+        self.rate = app.config.get("SCHEDULER_RATE", 20.0)
+        self.burst = app.config.get("SCHEDULER_BURST", 50)
+        self.max_workers = app.config.get("SCHEDULER_MAX_WORKERS", 8)
+        self.misfire_grace = app.config.get("SCHEDULER_MISFIRE_GRACE", 60)
+        self.max_catchup = app.config.get("SCHEDULER_MAX_CATCHUP", 10)
+        self.sync_interval = app.config.get("SCHEDULER_SYNC_INTERVAL", 30.0)
+        self.persist_interval = app.config.get("SCHEDULER_PERSIST_INTERVAL", 2.0)
+        app.extensions["scheduler"] = self
+        if app.config.get("SCHEDULER_ENABLED", False):
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """启动调度线程"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._tokens, self._token_time = float(self.burst), time.monotonic()
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="periodic-schedule")
+            self._thread = threading.Thread(target=self._run, name="periodic-scheduler", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def wait(self) -> None:
+        """阻塞直到调度线程退出"""
+        thread = self._thread
+        while thread is not None and thread.is_alive():
+            thread.join(1)
+
+    def refresh(self) -> None:
+        """通知调度线程立即同步数据库中的任务变更"""
+        with self._cond:
+            self._sync_requested = True
+            self._cond.notify()
+
+    def close(self) -> None:
+        """停止调度线程，等待进行中的调度请求并保存触发时间"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        thread.join()
+        self._executor.shutdown(wait=True)
+        self._thread = None
+        self._persist()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if self._sync_requested or now >= self._next_sync:
+                self._sync()
+            if now >= self._next_persist:
+                self._persist()
+            for fire_at, timer, nominal in self._pop_due():
+                if self._stop.is_set():
+                    break
+                self._handle(timer, fire_at, nominal)
+
+    def _pop_due(self) -> List[Tuple[float, _Timer, float]]:
+        """等待到堆顶到期或需要同步、保存，然后弹出全部到期条目"""
+        with self._cond:
+            while not (self._stop.is_set() or self._sync_requested):
+                timeout = min(self._next_sync, self._next_persist) - time.monotonic()
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - time.time())
+                if timeout <= 0:
+                    break
+                self._cond.wait(timeout)
+        due = []
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, _, timer_id, version, nominal = heapq.heappop(self._heap)
+            timer = self._timers.get(timer_id)
+            if timer is not None and timer.version == version:
+                due.append((fire_at, timer, nominal))
+        return due
+
+    def _handle(self, timer: _Timer, fire_at: float, nominal: float) -> None:
+        now = time.time()
+        late = now - fire_at > self.misfire_grace
+        if not late:
+            timer.backlog = 0
+            self._fire(timer, nominal)
+            next_nominal = timer.next_fire(nominal)
+        elif timer.policy == "once":
+            self._fire(timer, nominal)
+            next_nominal = timer.next_fire(now)
+        elif timer.policy == "catchup" and timer.backlog < self.max_catchup:
+            timer.backlog += 1
+            self._fire(timer, nominal)
+            next_nominal = timer.next_fire(nominal)
+        else:
+            SCHEDULER_FIRES.labels("skipped").inc()
+            next_nominal = timer.next_fire(now)
+        self._push(timer, next_nominal)
+
+    def _push(self, timer: _Timer, nominal: float) -> None:
+        fire_at = nominal + (random.uniform(0, timer.jitter) if timer.jitter else 0)
+        heapq.heappush(self._heap, (fire_at, next(self._seq), timer.id, timer.version, nominal))
+        with self._cond:
+            self._pending.setdefault(timer.id, {"id": timer.id})["next_run_time"] = int(nominal)
+
+    def _acquire(self) -> None:
+        """令牌桶限速，令牌不足时阻塞调度线程"""
+        while not self._stop.is_set():
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._token_time) * self.rate)
+            self._token_time = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            self._stop.wait((1 - self._tokens) / self.rate)
+
+    def _fire(self, timer: _Timer, nominal: float) -> None:
+        self._acquire()
+        self._executor.submit(self._schedule, timer, nominal)
+
+    def _schedule(self, timer: _Timer, nominal: float) -> None:
+        SCHEDULER_LAG.labels().observe(max(0.0, time.time() - nominal))
+        try:
+            result = timer.node.schedule(timer.project, timer.spider, timer.settings)
+        except Exception as e:
+            SCHEDULER_FIRES.labels("failed").inc()
+            logger.warning(f"周期任务{timer.id}调度失败: {str(e)}")
+            result = {"status": "error", "message": str(e)}
+        else:
+            SCHEDULER_FIRES.labels("fired").inc()
+        audit.record("periodic_schedule", project=timer.project, spider=timer.spider,
+                     target=result.get("jobid"), node=timer.node.name,
+                     detail={"schedule_id": timer.id, "status": result.get("status")},
+                     operator="scheduler")
+        with self._cond:
+            self._pending.setdefault(timer.id, {"id": timer.id})["last_run_time"] = int(time.time())
+
+    def _sync(self) -> None:
+        """加载变更过的任务，首次同步加载全部已启用任务"""
+        with self._cond:
+            self._sync_requested = False
+        self._next_sync = time.monotonic() + self.sync_interval
+        started = int(time.time())
+        with self.app.app_context():
+            try:
+                query = PeriodicScheduleModel.query
+                if self._synced_at:
+                    # 秒级时间戳，同一秒内的修改可能被重复读到，按配置签名去重
+                    query = query.filter(PeriodicScheduleModel.updated_time >= self._synced_at - 1)
+                else:
+                    query = query.filter(PeriodicScheduleModel.status == 1,
+                                         PeriodicScheduleModel.enable == 1)
+                nodes: Dict[int, Optional[ScrapydClient]] = {}
+                for row in query.all():
+                    self._apply(row, nodes)
+            except Exception as e:
+                logger.error(f"周期任务同步失败: {str(e)}")
+                return
+        self._synced_at = started
+        SCHEDULER_TIMERS.labels().set(len(self._timers))
+
+    def _apply(self, row: PeriodicScheduleModel, nodes: Dict[int, Optional[ScrapydClient]]) -> None:
+        if row.status != 1 or row.enable != 1:
+            self._timers.pop(row.id, None)
+            return
+        signature = (row.node_id, row.project, row.spider, row.settings, row.cron,
+                     row.interval, row.jitter, row.misfire_policy)
+        current = self._timers.get(row.id)
+        if current is not None and current.signature == signature:
+            return
+        if row.node_id is None:
+            node = client
+        else:
+            if row.node_id not in nodes:
+                found = get_clients([row.node_id])
+                nodes[row.node_id] = found[0] if found else None
+            node = nodes[row.node_id]
+        try:
+            if node is None:
+                raise ValueError("节点不存在或未启用")
+            timer = _Timer(row, next(self._versions), signature, node)
+        except ValueError as e:
+            logger.warning(f"周期任务{row.id}无法加载: {str(e)}")
+            self._timers.pop(row.id, None)
+            return
+        self._timers[row.id] = timer
+        # 重启后从保存的计划时间继续，错过的触发交由misfire_policy处理
+        if current is None and row.next_run_time:
+            nominal = float(row.next_run_time)
+        else:
+            nominal = timer.next_fire(time.time())
+        self._push(timer, nominal)
+
+    def _persist(self) -> None:
+        """批量保存触发时间"""
+        self._next_persist = time.monotonic() + self.persist_interval
+        with self._cond:
+            rows, self._pending = list(self._pending.values()), {}
+        if not rows or self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                db.session.execute(update(PeriodicScheduleModel), rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"周期任务触发时间保存失败({len(rows)}条): {str(e)}")
+
+
+scheduler = PeriodicScheduler()
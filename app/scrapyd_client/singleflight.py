@@ -0,0 +1,97 @@
+"""相同请求的合并(single-flight)
+
+同一时刻对同一个键发起的多次调用只会真正执行一次，其余调用等待并共享这次调用的结果。
+等待方既可以是线程，也可以是asyncio任务，二者通过concurrent.futures.Future共享同一次调用。
+与TTL缓存不同，调用结束后立即失效，不会返回过期数据。
+"""
+import asyncio
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.libs import metrics
+
+
+class SingleFlight:
+    """按键合并进行中的调用
+
+    共享的结果对所有调用方是同一个对象，调用方不应修改它
+    """
+
+    def __init__(self, name: str = "singleflight") -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """获取键对应的进行中调用，不存在时创建并返回leader标记"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.record_cache(self.name, True)
+                return future, False
+            future = self._calls[key] = Future()
+        metrics.record_cache(self.name, False)
+        return future, True
+
+    def _lead(self, key: Hashable, future: Future, func: Callable[[], Any]) -> Any:
+        """执行调用并把结果发布给所有等待方"""
+        try:
+            result = func()
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key: Hashable) -> None:
+        # 先移除再发布结果，之后到达的调用会发起新的请求而不是拿到旧结果
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """在当前线程中执行或等待调用
+
+        Args:
+            key (Hashable): 合并键
+            func (Callable[[], Any]): 实际执行的调用
+
+        Returns:
+            Any: 调用结果
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        return self._lead(key, future, func)
+
+    async def do_async(self, key: Hashable, func: Callable[[], Any],
+                       executor: Optional[Executor] = None) -> Any:
+        """在asyncio任务中执行或等待调用，阻塞的func会在线程池中执行
+
+        Args:
+            key (Hashable): 合并键
+            func (Callable[[], Any]): 实际执行的调用
+            executor (Optional[Executor], optional): 执行func的线程池. Defaults to None.
+
+        Returns:
+            Any: 调用结果
+        """
+        future, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            # 即使发起方任务被取消，调用仍会完成并通知其他等待方
+            loop.run_in_executor(executor, self._lead_quietly, key, future, func)
+        return await asyncio.wrap_future(future)
+
+    def _lead_quietly(self, key: Hashable, future: Future, func: Callable[[], Any]) -> None:
+        try:
+            self._lead(key, future, func)
+        except BaseException:
+            # 异常已经通过future传递给等待方
+            pass
+
+
+# Scrapyd请求共用的合并器
+scrapyd_flight = SingleFlight("scrapyd_singleflight")
@@ -0,0 +1,225 @@
+"""作业吞吐量时间序列
+
+Scrapy的LogStats扩展会定期输出如下日志:
+
+    2025-01-01 00:01:00 [scrapy.extensions.logstats] INFO: Crawled 120 pages (at 60 pages/min), scraped 60 items (at 30 items/min)
+
+这里从作业日志中增量解析这些行，每个作业保存一个紧凑的数值文件(小端序):
+
+    头部  magic(8) 已解析的日志字节偏移(u64) 记录数(u32) 作业是否已结束(u8)
+    记录  时间戳 已抓取页数 页面速率 已采集数据项数 数据项速率，各为u32
+
+头部在追加记录之后写入，只有头部中计数之内的记录有效。更新中途失败留下的多余记录
+会在下次更新时被截断，随后从头部中的偏移重新解析，不会产生重复记录。
+
+运行中的作业每次只通过Range请求读取上次偏移之后新增的日志，并且只解析到最后一个完整行；
+作业结束并解析完毕后不再访问Scrapyd。已归档的日志直接从本地归档读取。
+"""
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Flask, current_app
+
+from app.scrapyd_client.client import ScrapydClient
+from app.scrapyd_client.log_archive import LogArchive, _safe_component
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - 非POSIX平台不加锁
+    fcntl = None
+
+MAGIC = b"WSTPUT02"
+HEADER = struct.Struct("<8sQIB")
+RECORD = struct.Struct("<5I")
+COLUMNS = ("time", "pages", "pages_per_min", "items", "items_per_min")
+LOGSTATS = re.compile(
+    rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\S* \[[^\]]*\] INFO: Crawled (\d+) pages \(at (\d+) pages/min\), "
+    rb"scraped (\d+) items \(at (\d+) items/min\)", re.M)
+
+
+def parse_logstats(data: bytes) -> List[Tuple[int, int, int, int, int]]:
+    """解析日志片段中的LogStats行
+
+    Returns:
+        List[Tuple[int, int, int, int, int]]: 与COLUMNS顺序一致的记录
+    """
+    records = []
+    for match in LOGSTATS.finditer(data):
+        stamp = int(time.mktime(time.strptime(match.group(1).decode("ascii"), "%Y-%m-%d %H:%M:%S")))
+        records.append((stamp, int(match.group(2)), int(match.group(3)),
+                        int(match.group(4)), int(match.group(5))))
+    return records
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets降采样
+
+    保留首尾两点，其余点按桶划分，每个桶选取与前一个选中点、下一个桶均值构成面积最大三角形的点，
+    在点数大幅减少时仍能保留峰值与拐点的形状
+
+    Args:
+        xs (Sequence[float]): 横坐标，升序
+        ys (Sequence[float]): 纵坐标
+        threshold (int): 目标点数，至少为3
+
+    Returns:
+        List[int]: 选中点的下标
+    """
+    n = len(xs)
+    if threshold >= n or n <= 2:
+        return list(range(n))
+    threshold = max(3, threshold)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / count
+        avg_y = sum(ys[avg_start:avg_end]) / count
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = int(i * every) + 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+class ThroughputStore:
+    """按项目/爬虫/作业组织的吞吐量序列目录"""
+
+    def __init__(self, root: str, archive: Optional[LogArchive] = None) -> None:
+        self.root = root
+        self.archive = archive
+
+    def path(self, project: str, spider: str, job_id: str) -> Optional[str]:
+        """获取序列文件路径，参数不合法时返回None"""
+        if not all(_safe_component(v) for v in (project, spider, job_id)):
+            return None
+        return os.path.join(self.root, project, spider, f"{job_id}.tput")
+
+    def _source(self, node: ScrapydClient, project: str, spider: str, job_id: str,
+                offset: int) -> Iterator[bytes]:
+        """读取offset之后的日志，已归档时从本地归档读取"""
+        reader = self.archive.open(project, spider, job_id) if self.archive is not None else None
+        if reader is None:
+            yield from node.iter_log(project, spider, job_id, offset=offset)
+            return
+        with reader:
+            while offset < reader.size:
+                yield reader.read(offset, reader.block_size)
+                offset += reader.block_size
+
+    def update(self, node: ScrapydClient, project: str, spider: str, job_id: str,
+               finished: bool = False) -> bool:
+        """解析上次之后新增的日志并追加记录
+
+        Args:
+            node (ScrapydClient): 作业所在节点
+            project (str): 项目名称
+            spider (str): 爬虫名称
+            job_id (str): 作业ID
+            finished (bool, optional): 作业是否已结束，结束时会解析最后一个不完整行并封存序列. Defaults to False.
+
+        Returns:
+            bool: 序列是否已封存
+
+        Raises:
+            ValueError: 参数不合法
+            requests.RequestException: 读取日志失败
+        """
+        path = self.path(project, spider, job_id)
+        if path is None:
+            raise ValueError("非法的作业路径参数")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b") as f:
+            # 多个线程或工作进程可能同时更新同一个作业
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            header = f.read(HEADER.size)
+            offset, count = 0, 0
+            if len(header) == HEADER.size and header[:len(MAGIC)] == MAGIC:
+                _, offset, count, done = HEADER.unpack(header)
+                if done:
+                    return True
+            # 丢弃头部计数之外的记录(上次更新未完成)，旧格式或损坏的文件从头解析
+            f.truncate(HEADER.size + count * RECORD.size)
+
+            records: List[Tuple[int, int, int, int, int]] = []
+            pending = b""
+            for chunk in self._source(node, project, spider, job_id, offset):
+                data = pending + chunk
+                cut = data.rfind(b"\n") + 1
+                records.extend(parse_logstats(data[:cut]))
+                offset += cut
+                pending = data[cut:]
+            if finished:
+                records.extend(parse_logstats(pending))
+                offset += len(pending)
+
+            # 先追加记录再更新头部，中途失败时下次会截断多余记录并从旧偏移重新解析
+            f.seek(HEADER.size + count * RECORD.size)
+            f.write(b"".join(RECORD.pack(*r) for r in records))
+            f.flush()
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, offset, count + len(records), 1 if finished else 0))
+        return finished
+
+    def load(self, project: str, spider: str, job_id: str) -> Optional[Dict[str, array]]:
+        """读取序列，不存在时返回None
+
+        Returns:
+            Optional[Dict[str, array]]: 列名到数值数组的映射
+        """
+        path = self.path(project, spider, job_id)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+            return None
+        count = HEADER.unpack_from(data)[2]
+        values = array("I")
+        body = data[HEADER.size:HEADER.size + count * RECORD.size]
+        values.frombytes(body[:len(body) - len(body) % RECORD.size])
+        if sys.byteorder == "big":
+            values.byteswap()
+        width = len(COLUMNS)
+        return {name: values[i::width] for i, name in enumerate(COLUMNS)}
+
+    def is_finished(self, project: str, spider: str, job_id: str) -> bool:
+        path = self.path(project, spider, job_id)
+        if path is None or not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        return len(header) == HEADER.size and header[:len(MAGIC)] == MAGIC and HEADER.unpack(header)[3] == 1
+
+
+def downsample(series: Dict[str, array], points: int, metric: str) -> Dict[str, List[int]]:
+    """按指定指标的形状降采样到points个点，所有列取相同的下标"""
+    selected = lttb(series["time"], series[metric], points)
+    return {name: [column[i] for i in selected] for name, column in series.items()}
+
+
+def get_throughput() -> ThroughputStore:
+    """获取当前应用的吞吐量序列存储"""
+    return current_app.extensions["throughput"]
+
+
+def init_app(app: Flask) -> None:
+    """注册吞吐量序列存储，需在日志归档之后注册"""
+    app.extensions["throughput"] = ThroughputStore(
+        app.config.get("THROUGHPUT_DIR", "throughput"),
+        app.extensions.get("log_archive"))
@@ -10,7 +10,7 @@ class Form(WTForms):
 
     def __init__(self) -> None:
         data = request.get_json(silent=True)
-        args = request.data.to_dict()
+        args = request.form.to_dict()
         super(Form, self).__init__(data=data, **args)
 
     def validate_for_api(self) -> Any:
@@ -0,0 +1,240 @@
+"""本地Scrapyd替身服务
+
+模拟N个项目、M个作业、大日志、大数据项文件，并可注入延迟与失败，
+用于在没有真实Scrapyd节点的情况下对webspider进行压测。
+"""
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class FakeScrapydConfig:
+    """替身服务配置"""
+    projects: int = 5
+    spiders_per_project: int = 10
+    jobs_per_project: int = 1000
+    versions_per_project: int = 5
+    log_size: int = 1024 * 1024
+    items_per_job: int = 10000
+    item_size: int = 256
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    failure_rate: float = 0.0
+    seed: int = 9331
+
+
+class FakeScrapydData:
+    """按配置生成并缓存替身数据，保证同一配置下每次运行结果一致"""
+
+    def __init__(self, config: FakeScrapydConfig) -> None:
+        self.config = config
+        self.projects = [f"project_{i}" for i in range(config.projects)]
+        self._jobs: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        self._log: Optional[bytes] = None
+        self._items: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def spiders(self, project: str) -> List[str]:
+        return [f"spider_{i}" for i in range(self.config.spiders_per_project)]
+
+    def versions(self, project: str) -> List[str]:
+        return [f"r{i}" for i in range(self.config.versions_per_project)]
+
+    def jobs(self, project: str) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            if project not in self._jobs:
+                self._jobs[project] = self._build_jobs(project)
+            return self._jobs[project]
+
+    def _build_jobs(self, project: str) -> Dict[str, List[Dict[str, Any]]]:
+        rng = random.Random(f"{self.config.seed}:{project}")
+        spiders = self.spiders(project)
+        base = datetime(2025, 1, 1)
+        result: Dict[str, List[Dict[str, Any]]] = {"pending": [], "running": [], "finished": []}
+        for i in range(self.config.jobs_per_project):
+            spider = rng.choice(spiders)
+            start = base + timedelta(seconds=i * 60 + rng.randint(0, 59))
+            job = {"id": f"{project}-{i:08x}", "spider": spider}
+            bucket = rng.random()
+            if bucket < 0.05:
+                result["pending"].append(job)
+                continue
+            job["start_time"] = start.strftime("%Y-%m-%d %H:%M:%S.%f")
+            if bucket < 0.15:
+                result["running"].append(job)
+            else:
+                end = start + timedelta(seconds=rng.randint(30, 3600))
+                job["end_time"] = end.strftime("%Y-%m-%d %H:%M:%S.%f")
+                result["finished"].append(job)
+        return result
+
+    def log(self) -> bytes:
+        with self._lock:
+            if self._log is None:
+                self._log = self._build_log()
+            return self._log
+
+    def _build_log(self) -> bytes:
+        lines = []
+        size = 0
+        now = datetime(2025, 1, 1)
+        n = 0
+        while size < self.config.log_size:
+            now += timedelta(seconds=1)
+            stamp = now.strftime("%Y-%m-%d %H:%M:%S")
+            if n % 60 == 0:
+                line = (f"{stamp} [scrapy.extensions.logstats] INFO: Crawled {n} pages "
+                        f"(at 60 pages/min), scraped {n // 2} items (at 30 items/min)\n")
+            else:
+                line = (f"{stamp} [scrapy.core.engine] DEBUG: Crawled (200) "
+                        f"<GET https://example.com/page/{n}> (referer: None)\n")
+            lines.append(line)
+            size += len(line)
+            n += 1
+        return "".join(lines).encode("utf-8")[:self.config.log_size]
+
+    def items(self, job_id: str) -> bytes:
+        """作业的数据项，不同作业之间有少量新增、删除与变更，便于模拟跨运行对比"""
+        with self._lock:
+            if job_id not in self._items:
+                if len(self._items) >= 4:
+                    self._items.pop(next(iter(self._items)))
+                self._items[job_id] = self._build_items(job_id)
+            return self._items[job_id]
+
+    def _build_items(self, job_id: str) -> bytes:
+        rng = random.Random(f"{self.config.seed}:{job_id}")
+        shift = rng.randint(0, max(1, self.config.items_per_job // 100))
+        padding = "x" * max(0, self.config.item_size - 64)
+        lines = []
+        for i in range(shift, self.config.items_per_job + shift):
+            price = i % 997 if rng.random() > 0.01 else rng.randint(0, 10000)
+            lines.append(json.dumps({"url": f"https://example.com/page/{i}", "title": f"title {i}",
+                                     "price": price, "body": padding}, ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class FakeScrapydHandler(BaseHTTPRequestHandler):
+    """模拟Scrapyd的JSON API及日志、数据项静态文件"""
+
+    protocol_version = "HTTP/1.1"
+    server: "FakeScrapydServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        parsed = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                params.update({k: v[-1] for k, v in parse_qs(body.decode("utf-8")).items()})
+
+        config = self.server.config
+        delay = config.latency + random.uniform(0, config.latency_jitter)
+        if delay:
+            time.sleep(delay)
+        if config.failure_rate and random.random() < config.failure_rate:
+            self._send(500, b"injected failure", "text/plain")
+            return
+
+        status, body, content_type = self.server.route(method, parsed.path.lstrip("/"), params)
+        self._send(status, body, content_type)
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeScrapydServer(ThreadingHTTPServer):
+    """可在后台线程中启动的Scrapyd替身服务"""
+
+    daemon_threads = True
+    # 默认的监听队列只有5，高并发时会出现连接被重置
+    request_queue_size = 256
+
+    def __init__(self, config: Optional[FakeScrapydConfig] = None,
+                 host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or FakeScrapydConfig()
+        self.data = FakeScrapydData(self.config)
+        self._thread: Optional[threading.Thread] = None
+        super().__init__((host, port), FakeScrapydHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeScrapydServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-scrapyd", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务并释放端口"""
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # 客户端提前断开(如只读取部分数据项)属于正常情况
+        if isinstance(sys.exc_info()[1], (ConnectionError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    def route(self, method: str, path: str, params: Dict[str, str]) -> Tuple[int, bytes, str]:
+        """根据请求路径生成响应
+
+        Returns:
+            Tuple[int, bytes, str]: 状态码、响应体与Content-Type
+        """
+        data = self.data
+        if path.startswith("logs/"):
+            return 200, data.log(), "text/plain; charset=utf-8"
+        if path.startswith("items/"):
+            return 200, data.items(path.rsplit("/", 1)[-1]), "application/octet-stream"
+
+        project = params.get("project", "")
+        if path == "daemonstatus.json":
+            payload: Dict[str, Any] = {"status": "ok", "running": 1, "pending": 0,
+                                       "finished": 10, "node_name": "fake-scrapyd"}
+        elif path == "listprojects.json":
+            payload = {"status": "ok", "projects": data.projects}
+        elif path == "listspiders.json":
+            payload = {"status": "ok", "spiders": data.spiders(project)}
+        elif path == "listversions.json":
+            payload = {"status": "ok", "versions": data.versions(project)}
+        elif path == "listjobs.json":
+            payload = {"status": "ok", **data.jobs(project)}
+        elif path == "schedule.json" and method == "POST":
+            payload = {"status": "ok", "jobid": f"{random.getrandbits(64):016x}"}
+        elif path == "cancel.json" and method == "POST":
+            payload = {"status": "ok", "prevstate": "running"}
+        elif path == "addversion.json" and method == "POST":
+            payload = {"status": "ok", "project": project, "spiders": self.config.spiders_per_project}
+        elif path in ("delproject.json", "delversion.json") and method == "POST":
+            payload = {"status": "ok"}
+        else:
+            return 404, b"No Such Resource", "text/plain"
+        return 200, json.dumps(payload).encode("utf-8"), "application/json"
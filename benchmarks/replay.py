@@ -0,0 +1,303 @@
+"""录制流量回放
+
+用法:
+    python -m benchmarks.replay recordings/traffic-*.jsonl --speed 2 --output bench_results/replay.json
+    python -m benchmarks.replay recordings/*.jsonl --speed 4 --compare bench_results/replay.json
+
+录制文件由开启RECORDER_ENABLED的应用写出。回放按录制时的请求间隔除以倍速发起请求，不等待前一个请求完成，
+应用处理能力不足时表现为延迟上升；延迟从请求的计划发起时间开始计算，包含排队等待的时间。
+Scrapyd由本地替身服务代替，按录制的状态码、响应体与耗时返回。录制默认不保存响应体，
+这类调用与日志、数据项文件一样由替身数据生成内容；录制时开启RECORDER_UPSTREAM_BODIES
+才会按录制的(脱敏后的)JSON响应体返回。每个录制的身份对应一个回放用户，令牌的访问级别与录制时一致。
+"""
+import argparse
+import io
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.libs.recorder import REDACTED
+from app.models.base import db
+from app.models.users import UsersModel
+from app.scrapyd_client import client as client_module
+from benchmarks import report
+from benchmarks.fake_scrapyd import FakeScrapydConfig, FakeScrapydServer
+
+# 替换录制时被脱敏的密码等字段
+REPLAY_SECRET = "replay_password"
+
+# (录制的请求, 延迟, 状态码, 是否失败)
+Sample = Tuple[Dict[str, Any], float, int, bool]
+
+
+def parse_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行选项"""
+    parser = argparse.ArgumentParser(description="按录制的流量回放压测 webspider")
+    parser.add_argument("recordings", nargs="+", help="录制文件，多个文件按时间合并")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速，2表示请求间隔缩短为一半")
+    parser.add_argument("--concurrency", type=int, default=64, help="同时处理的最大请求数")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="替身服务耗时相对录制耗时的倍数")
+    parser.add_argument("--limit", type=int, help="最多回放的请求数")
+    parser.add_argument("--output", default="bench_results/replay.json", help="结果文件路径")
+    parser.add_argument("--compare", help="用于对比的历史结果文件")
+    options = parser.parse_args(argv)
+    if options.speed <= 0:
+        parser.error("--speed 必须大于0")
+    return options
+
+
+def load_recordings(paths: Iterable[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """读取录制文件并按请求时间排序，跳过无法解析的行"""
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "t" in record and "path" in record:
+                    records.append(record)
+    records.sort(key=lambda r: r["t"])
+    return records[:limit] if limit else records
+
+
+def _canonical(params: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, str], ...]:
+    # 替身服务只能看到每个参数的最后一个值
+    return tuple(sorted((str(k), str(v[-1] if isinstance(v, list) and v else v))
+                        for k, v in (params or {}).items()))
+
+
+class ReplayScrapydServer(FakeScrapydServer):
+    """按录制的Scrapyd调用返回响应的替身服务
+
+    同一调用(方法、路径与参数都相同)有多次录制时依次循环返回；参数对不上时退回到同一路径的录制，
+    没有任何录制的路径交给FakeScrapydServer生成
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]], latency_scale: float = 1.0,
+                 config: Optional[FakeScrapydConfig] = None) -> None:
+        super().__init__(config)
+        self.latency_scale = latency_scale
+        self._calls: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursors: Dict[Any, itertools.count] = defaultdict(itertools.count)
+        self._lock = threading.Lock()
+        for record in records:
+            for call in record.get("upstream") or ():
+                method, path = call["method"], call["endpoint"].lstrip("/")
+                self._calls[(method, path, _canonical(call.get("params")))].append(call)
+                self._calls[(method, path)].append(call)
+
+    def _next_call(self, method: str, path: str, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        for key in ((method, path, _canonical(params)), (method, path)):
+            calls = self._calls.get(key)
+            if calls:
+                with self._lock:
+                    index = next(self._cursors[key])
+                return calls[index % len(calls)]
+        return None
+
+    def _file_body(self, path: str, size: int) -> bytes:
+        template = self.data.log() if path.startswith("logs/") else self.data.items(path.rsplit("/", 1)[-1])
+        if size <= len(template):
+            return template[:size]
+        return (template * (size // len(template) + 1))[:size]
+
+    def route(self, method: str, path: str, params: Dict[str, str]) -> Tuple[int, bytes, str]:
+        call = self._next_call(method, path, params)
+        if call is None:
+            return super().route(method, path, params)
+        if call["duration"] and self.latency_scale:
+            time.sleep(call["duration"] * self.latency_scale)
+        if call["status"] == "error":
+            return 502, b"replayed upstream failure", "text/plain"
+        status = int(call["status"])
+        if path.startswith(("logs/", "items/")):
+            if status == 416:
+                return status, b"", "text/plain"
+            # Range请求按完整文件返回，客户端自行跳过已读取的部分
+            offset = (call.get("params") or {}).get("offset", 0)
+            content = self._file_body(path, offset + call["size"])
+            return (200 if status == 206 else status), content, "application/octet-stream"
+        body = call.get("body")
+        if body is None:
+            return super().route(method, path, params)
+        content = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+        return status, content.encode("utf-8"), "application/json"
+
+
+def _restore(value: Any) -> Any:
+    if value == REDACTED:
+        return REPLAY_SECRET
+    if isinstance(value, dict):
+        return {k: _restore(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_restore(v) for v in value]
+    return value
+
+
+def build_request(record: Dict[str, Any], token: Optional[str]) -> Dict[str, Any]:
+    """把录制的请求转换为测试客户端open方法的关键字参数"""
+    kwargs: Dict[str, Any] = {"method": record["method"], "path": record["path"]}
+    if record.get("query"):
+        kwargs["query_string"] = _restore(record["query"])
+    if record.get("json") is not None:
+        kwargs["json"] = _restore(record["json"])
+    elif record.get("form") is not None or record.get("files"):
+        data: Dict[str, Any] = {k: v[-1] if isinstance(v, list) else v
+                                for k, v in _restore(record.get("form") or {}).items()}
+        for name, meta in (record.get("files") or {}).items():
+            data[name] = (io.BytesIO(b"\0" * meta.get("size", 0)), meta.get("filename") or name)
+        kwargs["data"] = data
+        kwargs["content_type"] = "multipart/form-data"
+    if token:
+        kwargs["headers"] = {"Authorization": f"Bearer {token}"}
+    return kwargs
+
+
+class ReplayTokens:
+    """为每个录制的身份创建回放用户，并按录制时的访问级别签发令牌"""
+
+    def __init__(self, app: Flask, identities: Iterable[str]) -> None:
+        self.app = app
+        self._claims: Dict[str, Dict[str, Any]] = {}
+        # (身份, 访问级别) -> 令牌，首次使用时签发
+        self._tokens: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        with app.app_context():
+            for identity in identities:
+                user = UsersModel()
+                user.nickname = f"replay_{identity}"[:32]
+                user.password = REPLAY_SECRET
+                db.session.add(user)
+                db.session.flush()
+                self._claims[identity] = {"id": user.id, "username": user.nickname, "is_active": True}
+            db.session.commit()
+
+    def get(self, identity: Optional[str], scope: Optional[str] = None) -> Optional[str]:
+        """获取身份在指定访问级别下的令牌，未记录访问级别的旧录制按user处理"""
+        claims = self._claims.get(identity) if identity else None
+        if claims is None:
+            return None
+        key = (identity, scope or "user")
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None:
+                with self.app.app_context():
+                    token = create_access_token(identity=str(claims["id"]),
+                                                additional_claims={**claims, "scope": key[1]})
+                self._tokens[key] = token
+        return token
+
+    def renew(self, identity: Optional[str]) -> None:
+        """丢弃身份已签发的令牌，回放的登出请求会撤销该身份原来的令牌"""
+        with self._lock:
+            for key in [key for key in self._tokens if key[0] == identity]:
+                del self._tokens[key]
+
+
+def prepare_app(scrapyd_url: str, identities: Iterable[str]) -> Tuple[Flask, ReplayTokens]:
+    """创建测试应用并将Scrapyd客户端指向回放替身服务"""
+    app = create_app("test")
+    client_module.client.target = scrapyd_url.rstrip("/")
+    with app.app_context():
+        db.create_all()
+    return app, ReplayTokens(app, identities)
+
+
+def replay(app: Flask, tokens: ReplayTokens, records: List[Dict[str, Any]], speed: float,
+           concurrency: int) -> List[Dict[str, Any]]:
+    """按录制的时间间隔回放请求并按端点汇总结果
+
+    Raises:
+        Exception: 回放请求本身出错(而不是接口返回错误)时，在全部请求结束后抛出第一个异常
+    """
+    local = threading.local()
+
+    def one(record: Dict[str, Any], due: float) -> Sample:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        token = tokens.get(record.get("identity"), record.get("scope"))
+        response = client.open(**build_request(record, token))
+        response.get_data()
+        failed = report.is_error(response.status_code, response.get_json(silent=True))
+        if record.get("endpoint") == "user.logout":
+            tokens.renew(record.get("identity"))
+        return record, time.perf_counter() - due, response.status_code, failed
+
+    rss_before = report.current_rss()
+    start = time.perf_counter()
+    futures: List["Future[Sample]"] = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        first = records[0]["t"]
+        for record in records:
+            due = start + (record["t"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(one, record, due))
+    elapsed = time.perf_counter() - start
+    rss_after = report.current_rss()
+    samples = [future.result() for future in futures]
+
+    groups: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups[sample[0].get("endpoint") or sample[0]["path"]].append(sample)
+    groups["all"] = samples
+
+    results = []
+    for name, group in sorted(groups.items(), key=lambda kv: (kv[0] == "all", -len(kv[1]))):
+        summary = report.summarize(name, [s[1] for s in group], [s[2] for s in group],
+                                   elapsed, rss_before, rss_after, errors=sum(1 for s in group if s[3]))
+        recorded = sorted(s[0].get("duration") or 0.0 for s in group)
+        summary["recorded_p95_ms"] = round(report.percentile(recorded, 95) * 1000, 3)
+        summary["status_mismatches"] = sum(1 for s in group if s[0].get("status") != s[2])
+        results.append(summary)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """回放入口函数"""
+    options = parse_options(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    records = load_recordings(options.recordings, options.limit)
+    if not records:
+        print("录制文件中没有可回放的请求", file=sys.stderr)
+        return 2
+
+    server = ReplayScrapydServer(records, options.latency_scale).start()
+    try:
+        identities = sorted({r["identity"] for r in records if r.get("identity")})
+        app, tokens = prepare_app(server.url, identities)
+        # 接口异常按500计入结果，并关闭错误日志避免输出影响测量
+        app.config["PROPAGATE_EXCEPTIONS"] = False
+        app.logger.disabled = True
+        results = replay(app, tokens, records, options.speed, options.concurrency)
+    finally:
+        server.stop()
+
+    document = report.build_results(results, dict(vars(options)))
+    report.write_results(document, options.output)
+
+    baseline = report.load_results(options.compare) if options.compare else None
+    print(report.format_table(document, baseline))
+    mismatches = next(s["status_mismatches"] for s in results if s["name"] == "all")
+    print(f"\n回放{len(records)}个请求，倍速{options.speed:g}，状态码与录制不一致的请求: {mismatches}")
+    print(f"结果已写入 {options.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
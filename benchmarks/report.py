@@ -0,0 +1,151 @@
+"""压测结果统计与输出
+
+计算p50/p95/p99延迟、记录进程RSS，并写出可供多次运行对比的JSON结果文件。
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """对已排序的数据按线性插值计算百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = rank - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def current_rss() -> int:
+    """当前进程常驻内存(字节)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """进程峰值常驻内存(字节)"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字节为单位，Linux以KB为单位
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def is_error(status: int, body: Any) -> bool:
+    """判断一次请求是否失败
+
+    spider_api的接口出错时同样返回HTTP 200，错误码放在JSON的code字段中，因此两者都要检查
+
+    Args:
+        status: HTTP状态码
+        body: 解析后的JSON响应体，不是JSON时为None
+    """
+    if status >= 400:
+        return True
+    return isinstance(body, dict) and "code" in body and body["code"] != 200
+
+
+def summarize(name: str, latencies: List[float], statuses: List[int], elapsed: float,
+              rss_before: int, rss_after: int, errors: int = 0) -> Dict[str, Any]:
+    """汇总单个场景的压测数据
+
+    Args:
+        name: 场景名称
+        latencies: 每次请求耗时(秒)
+        statuses: 每次请求的HTTP状态码
+        elapsed: 场景总耗时(秒)
+        rss_before: 场景开始前RSS
+        rss_after: 场景结束后RSS
+        errors: 失败的请求数(HTTP状态码异常或JSON中的code不为200)
+
+    Returns:
+        Dict[str, Any]: 场景统计结果，延迟单位为毫秒
+    """
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "name": name,
+        "requests": count,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "min": round(values[0] * 1000, 3) if values else 0.0,
+            "mean": round(sum(values) / count * 1000, 3) if values else 0.0,
+            "p50": round(percentile(values, 50) * 1000, 3),
+            "p95": round(percentile(values, 95) * 1000, 3),
+            "p99": round(percentile(values, 99) * 1000, 3),
+            "max": round(values[-1] * 1000, 3) if values else 0.0,
+        },
+        "status_codes": {str(k): v for k, v in sorted(Counter(statuses).items())},
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "rss_bytes": {"before": rss_before, "after": rss_after, "delta": rss_after - rss_before},
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_results(scenarios: List[Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+    """组装完整的结果文档"""
+    return {
+        "version": 1,
+        "timestamp": int(time.time()),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "peak_rss_bytes": peak_rss(),
+        "scenarios": scenarios,
+    }
+
+
+def write_results(results: Dict[str, Any], path: str) -> None:
+    """写出JSON结果文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_table(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """将结果格式化为文本表格，提供基线时附带p95变化比例"""
+    base = {s["name"]: s for s in (baseline or {}).get("scenarios", [])}
+    header = (f"{'scenario':<18}{'reqs':>7}{'errors':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}"
+              f"{'rssΔ(KB)':>11}")
+    if base:
+        header += f"{'p95Δ':>9}"
+    lines = [header, "-" * len(header)]
+    for s in results["scenarios"]:
+        lat = s["latency_ms"]
+        line = (f"{s['name']:<18}{s['requests']:>7}{s.get('errors', 0):>8}{s['throughput_rps']:>10.1f}"
+                f"{lat['p50']:>10.2f}{lat['p95']:>10.2f}{lat['p99']:>10.2f}"
+                f"{s['rss_bytes']['delta'] // 1024:>11}")
+        old = base.get(s["name"])
+        if old and old["latency_ms"]["p95"]:
+            change = (lat["p95"] - old["latency_ms"]["p95"]) / old["latency_ms"]["p95"] * 100
+            line += f"{change:>+8.1f}%"
+        lines.append(line)
+    if not results.get("options", {}).get("ratelimit_enabled", True):
+        lines.append("\n注意: 压测时未开启限流(RATELIMIT_ENABLED=False)，结果不包含限流开销与429拒绝")
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""webspider压测入口
+
+用法:
+    python -m benchmarks.run --requests 200 --concurrency 8 --output bench_results/latest.json
+    python -m benchmarks.run --scenario jobs --scenario log --latency 0.02 --compare bench_results/base.json
+    python -m benchmarks.run --scenario status --concurrency 16 --ratelimit
+"""
+import argparse
+import itertools
+import logging
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+from app import create_app
+from app.libs import ratelimit
+from app.models.base import db
+from app.models.users import UsersModel
+from app.scrapyd_client import client as client_module
+from benchmarks import report, scenarios
+from benchmarks.fake_scrapyd import FakeScrapydConfig, FakeScrapydServer
+
+
+def parse_options(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行选项"""
+    parser = argparse.ArgumentParser(description="webspider 吞吐与延迟压测")
+    parser.add_argument("--scenario", action="append", dest="scenarios",
+                        help="只运行指定场景，可重复指定")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发线程数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个场景的预热请求数")
+    parser.add_argument("--scrapyd-url", help="使用已有的Scrapyd节点而不是本地替身服务")
+    parser.add_argument("--projects", type=int, default=5, help="替身服务的项目数")
+    parser.add_argument("--jobs", type=int, default=1000, help="替身服务每个项目的作业数")
+    parser.add_argument("--log-size", type=int, default=1024 * 1024, help="替身服务日志大小(字节)")
+    parser.add_argument("--items", type=int, default=10000, help="替身服务每个作业的数据项数")
+    parser.add_argument("--latency", type=float, default=0.0, help="替身服务注入的固定延迟(秒)")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="替身服务注入的随机延迟上限(秒)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="替身服务注入的失败比例")
+    parser.add_argument("--ratelimit", action="store_true",
+                        help="开启限流(令牌桶容量足够大，不会拒绝请求)，用于测量限流本身的开销")
+    parser.add_argument("--output", default="bench_results/latest.json", help="结果文件路径")
+    parser.add_argument("--compare", help="用于对比的历史结果文件")
+    return parser.parse_args(argv)
+
+
+class TokenIssuer:
+    """为压测场景签发令牌"""
+
+    def __init__(self, app: Flask, user: Dict[str, Any]) -> None:
+        self.app = app
+        self.user = user
+        with app.app_context():
+            self._tokens = {kind: self._create(kind) for kind in ("access", "admin", "refresh")}
+
+    def _create(self, kind: str) -> str:
+        if kind == "refresh":
+            return create_refresh_token(identity=str(self.user["id"]))
+        claims = {**self.user, "scope": "admin"} if kind == "admin" else self.user
+        return create_access_token(identity=str(self.user["id"]), additional_claims=claims)
+
+    def issue(self, scenario: scenarios.Scenario) -> Optional[str]:
+        if not scenario.token:
+            return None
+        if not scenario.fresh_token:
+            return self._tokens[scenario.token]
+        with self.app.app_context():
+            return self._create(scenario.token)
+
+
+def prepare_app(scrapyd_url: str, enable_ratelimit: bool = False) -> Tuple[Flask, TokenIssuer]:
+    """创建测试应用、初始化数据库并将Scrapyd客户端指向压测目标
+
+    enable_ratelimit为True时在临时目录中开启限流，各类别的速率足够大，只测量令牌桶与并发槽位的开销
+    """
+    app = create_app("test")
+    client_module.client.target = scrapyd_url.rstrip("/")
+    if enable_ratelimit:
+        app.config["RATELIMIT_ENABLED"] = True
+        app.config["RATELIMIT_DIR"] = tempfile.mkdtemp(prefix="webspider-bench-ratelimit-")
+        app.config["RATELIMIT_CLASSES"] = {
+            name: {"rate": 1e9, "burst": 1e9} for name in app.config["RATELIMIT_CLASSES"]}
+        ratelimit.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        admin = UsersModel()
+        admin.nickname = "bench_admin"
+        admin.password = "bench_password"
+        db.session.add(admin)
+        db.session.commit()
+        user = {"id": admin.id, "username": admin.nickname, "is_active": True, "scope": "user"}
+
+    return app, TokenIssuer(app, user)
+
+
+def run_scenario(app: Flask, issuer: TokenIssuer, scenario: scenarios.Scenario,
+                 total: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """以指定并发对单个场景发起请求并汇总结果"""
+    local = threading.local()
+    counter = itertools.count()
+
+    def one(_: int) -> Tuple[float, int, bool]:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        kwargs = scenario.build(next(counter), issuer.issue(scenario))
+        start = time.perf_counter()
+        response = client.open(**kwargs)
+        response.get_data()
+        latency = time.perf_counter() - start
+        return latency, response.status_code, report.is_error(response.status_code,
+                                                              response.get_json(silent=True))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(warmup)))
+        rss_before = report.current_rss()
+        start = time.perf_counter()
+        samples = list(executor.map(one, range(total)))
+        elapsed = time.perf_counter() - start
+        rss_after = report.current_rss()
+
+    latencies = [latency for latency, _, _ in samples]
+    statuses = [status for _, status, _ in samples]
+    errors = sum(1 for _, _, error in samples if error)
+    return report.summarize(scenario.name, latencies, statuses, elapsed, rss_before, rss_after, errors)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """压测入口函数"""
+    options = parse_options(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    try:
+        selected = scenarios.select(options.scenarios)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    server = None
+    scrapyd_url = options.scrapyd_url
+    if not scrapyd_url:
+        server = FakeScrapydServer(FakeScrapydConfig(
+            projects=options.projects,
+            jobs_per_project=options.jobs,
+            log_size=options.log_size,
+            items_per_job=options.items,
+            latency=options.latency,
+            latency_jitter=options.latency_jitter,
+            failure_rate=options.failure_rate,
+        )).start()
+        scrapyd_url = server.url
+
+    try:
+        app, issuer = prepare_app(scrapyd_url, options.ratelimit)
+        # 接口异常按500计入结果，并关闭错误日志避免输出影响测量
+        app.config["PROPAGATE_EXCEPTIONS"] = False
+        app.logger.disabled = True
+        results = [
+            run_scenario(app, issuer, scenario, options.requests, options.concurrency, options.warmup)
+            for scenario in selected
+        ]
+    finally:
+        if server:
+            server.stop()
+
+    document = report.build_results(results, {**vars(options),
+                                               "ratelimit_enabled": app.config.get("RATELIMIT_ENABLED", False)})
+    report.write_results(document, options.output)
+
+    baseline = report.load_results(options.compare) if options.compare else None
+    print(report.format_table(document, baseline))
+    print(f"\n结果已写入 {options.output}")
+
+    # 全部请求都失败的场景说明接口本身不可用，其延迟数据没有意义
+    broken = [s["name"] for s in results if s["requests"] and s["errors"] == s["requests"]]
+    if broken:
+        print(f"以下场景的请求全部失败: {', '.join(broken)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
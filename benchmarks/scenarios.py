@@ -0,0 +1,106 @@
+"""压测场景定义
+
+覆盖spider_api与user两个蓝图的接口。
+"""
+from dataclasses import dataclass, field
+import io
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT = "project_0"
+SPIDER = "spider_0"
+# 替身数据(默认种子)中两个已结束的作业，作业编号为十六进制
+JOB_ID = "project_0-0000000f"
+BASE_JOB_ID = "project_0-00000001"
+
+
+@dataclass
+class Scenario:
+    """单个接口的压测场景
+
+    Attributes:
+        name: 场景名称
+        method: 请求方法
+        path: 请求路径
+        params: 查询参数
+        body: JSON请求体，可以是根据请求序号生成请求体的函数
+        form: 根据请求序号生成multipart表单的函数
+        token: 需要携带的令牌类型("access"、"admin"或"refresh")，为空时不携带
+        fresh_token: 是否每次请求都使用新签发的令牌(如登出会撤销令牌)
+    """
+    name: str
+    method: str
+    path: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    body: Optional[Any] = None
+    form: Optional[Callable[[int], Dict[str, Any]]] = None
+    token: Optional[str] = None
+    fresh_token: bool = False
+
+    def build(self, index: int, token: Optional[str] = None) -> Dict[str, Any]:
+        """构造第index次请求的参数
+
+        Returns:
+            Dict[str, Any]: 可直接传给测试客户端open方法的关键字参数
+        """
+        kwargs: Dict[str, Any] = {"method": self.method, "path": self.path}
+        if self.params:
+            kwargs["query_string"] = self.params
+        body = self.body(index) if callable(self.body) else self.body
+        if body is not None:
+            kwargs["json"] = body
+        if self.form is not None:
+            kwargs["data"] = self.form(index)
+            kwargs["content_type"] = "multipart/form-data"
+        if self.token and token:
+            kwargs["headers"] = {"Authorization": f"Bearer {token}"}
+        return kwargs
+
+
+def _register_body(index: int) -> Dict[str, str]:
+    return {"username": f"bench_user_{index}", "password": "bench_password"}
+
+
+def _deploy_form(index: int) -> Dict[str, Any]:
+    # 固定内容与版本号，首次部署之后走内容哈希去重路径
+    return {"project": PROJECT, "version": "r0", "egg": (io.BytesIO(b"x" * 65536), "bench.egg")}
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("projects", "GET", "/projects"),
+    Scenario("spiders", "GET", "/spiders", {"project": PROJECT}),
+    Scenario("jobs", "GET", "/jobs", {"project": PROJECT}),
+    Scenario("jobs_page", "GET", "/jobs", {"project": PROJECT, "spider": SPIDER, "status": "finished", "limit": 20}),
+    Scenario("schedule", "POST", "/schedule", body={"project": PROJECT, "spider": SPIDER}),
+    Scenario("cancel", "POST", "/cancel", body={"project": PROJECT, "job_id": JOB_ID}),
+    Scenario("cancel_bulk", "POST", "/cancel/bulk", body={"project": PROJECT, "spider": SPIDER}, token="admin"),
+    Scenario("log", "GET", "/log", {"project": PROJECT, "spider": SPIDER, "job_id": JOB_ID}),
+    Scenario("status", "GET", "/status"),
+    Scenario("versions", "GET", "/versions", {"project": PROJECT}),
+    Scenario("deploy", "POST", "/deploy", form=_deploy_form, token="admin"),
+    Scenario("delete_project", "DELETE", "/project", {"project": PROJECT}, token="admin"),
+    Scenario("delete_version", "DELETE", "/version", {"project": PROJECT, "version": "r0"}),
+    Scenario("job_stats", "GET", "/job/stats", {"project": PROJECT, "job_id": JOB_ID}),
+    Scenario("job_items", "GET", "/job/items", {"project": PROJECT, "spider": SPIDER, "job_id": JOB_ID}),
+    Scenario("job_throughput", "GET", "/job/throughput", {"project": PROJECT, "spider": SPIDER, "job_id": JOB_ID}),
+    Scenario("job_items_profile", "GET", "/job/items/profile",
+             {"project": PROJECT, "spider": SPIDER, "job_id": JOB_ID}),
+    Scenario("job_items_diff", "GET", "/job/items/diff",
+             {"project": PROJECT, "spider": SPIDER, "base_job_id": BASE_JOB_ID, "job_id": JOB_ID, "key": "url"}),
+    Scenario("user_register", "POST", "/api/user/register", body=_register_body),
+    Scenario("user_login", "POST", "/api/user/login", body={"username": "bench_admin", "password": "bench_password"}),
+    Scenario("user_refresh", "POST", "/api/user/refresh", token="refresh"),
+    Scenario("user_profile", "GET", "/api/user/profile", token="access"),
+    Scenario("user_logout", "POST", "/api/user/logout", token="access", fresh_token=True),
+]
+
+
+def select(names: Optional[List[str]] = None) -> List[Scenario]:
+    """按名称筛选场景，未指定时返回全部场景"""
+    if not names:
+        return list(SCENARIOS)
+    by_name: Dict[str, Scenario] = {s.name: s for s in SCENARIOS}
+    unknown = [n for n in names if n not in by_name]
+    if unknown:
+        raise ValueError(f"未知的场景: {', '.join(unknown)}")
+    return [by_name[n] for n in names]
+
@@ -0,0 +1,69 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.config import Testing
+from app.libs import jwt as jwt_module
+from app.libs.audit import audit
+from app.models.base import db
+from app.models.users import UsersModel
+from app.scrapyd_client import client as client_module
+from benchmarks.fake_scrapyd import FakeScrapydConfig, FakeScrapydServer
+
+# 各功能写入本地文件的目录，测试时都放到临时目录下
+DATA_DIRS = ("PROFILE_DIR", "EGG_STORAGE_DIR", "LOG_ARCHIVE_DIR", "THROUGHPUT_DIR", "RATELIMIT_DIR",
+             "RECORDER_DIR")
+
+
+@pytest.fixture(scope="session")
+def scrapyd():
+    """整个测试会话共用的Scrapyd替身服务"""
+    server = FakeScrapydServer(FakeScrapydConfig(
+        projects=2, spiders_per_project=2, jobs_per_project=20, versions_per_project=2,
+        log_size=20000, items_per_job=50)).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, scrapyd):
+    for name in DATA_DIRS:
+        monkeypatch.setattr(Testing, name, str(tmp_path / name.lower()), raising=False)
+    # 默认密钥过短，PyJWT会对每次签发与校验给出警告
+    monkeypatch.setattr(Testing, "JWT_SECRET_KEY", "webspider-test-secret-key-0123456789")
+    # 审计线程每个测试结束时停止，缩短等待时间
+    monkeypatch.setattr(Testing, "AUDIT_FLUSH_INTERVAL", 0.05, raising=False)
+    monkeypatch.setattr(client_module.client, "target", scrapyd.url)
+    # 用户ID在每个测试的新数据库中重新从1开始，进程级缓存不能跨测试保留
+    jwt_module.user_cache.clear()
+    jwt_module.token_cache.clear()
+    app = create_app("test")
+    with app.app_context():
+        db.create_all()
+    yield app
+    # 在删除表之前写入本次测试的审计记录
+    audit.close()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """创建用户并返回携带其访问令牌的请求头"""
+    def make(username: str = "alice", scope: str = "user", **claims):
+        with app.app_context():
+            user = UsersModel()
+            user.nickname = username
+            user.password = "password"
+            db.session.add(user)
+            db.session.commit()
+            additional = {"id": user.id, "username": username, "is_active": True, "scope": scope, **claims}
+            token = create_access_token(identity=str(user.id), additional_claims=additional)
+        return {"Authorization": f"Bearer {token}"}
+    return make
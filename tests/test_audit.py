@@ -0,0 +1,49 @@
+import logging
+import queue
+
+from app.libs.audit import AUDIT_RECORDS, AuditWriter, audit, current_operator
+from app.models.audit import AuditLogModel
+
+
+def written_rows(app):
+    audit.close()
+    with app.app_context():
+        return [row.to_dict() for row in AuditLogModel.query.order_by(AuditLogModel.id)]
+
+
+def test_operator_outside_request_is_none(app):
+    with app.app_context():
+        assert current_operator() is None
+
+
+def test_anonymous_operator_uses_remote_address(app):
+    with app.test_request_context("/", environ_base={"REMOTE_ADDR": "10.0.0.7"}):
+        assert current_operator() == "anonymous@10.0.0.7"
+
+
+def test_schedule_is_audited_with_user_identity(app, client, make_user):
+    headers = make_user()
+    response = client.post("/schedule", json={"project": "project_0", "spider": "spider_0"}, headers=headers)
+    assert response.get_json()["code"] == 200
+    rows = written_rows(app)
+    assert [(row["action"], row["operator"], row["spider"]) for row in rows] == [("schedule", "1", "spider_0")]
+
+
+def test_anonymous_cancel_is_audited_with_address(app, client):
+    client.post("/cancel", json={"project": "project_0", "job_id": "job"})
+    rows = written_rows(app)
+    assert [(row["action"], row["operator"]) for row in rows] == [("cancel", "anonymous@127.0.0.1")]
+
+
+def test_full_queue_drops_with_warning(app, caplog, monkeypatch):
+    writer = AuditWriter()
+    writer._queue = queue.Queue(maxsize=1)
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+    dropped = AUDIT_RECORDS.labels("dropped")
+    before = dropped.value
+    with caplog.at_level(logging.WARNING, logger="app.libs.audit"):
+        for _ in range(3):
+            writer.record("cancel", project="p", target="j", operator="x")
+    assert dropped.value == before + 2
+    assert sum("丢弃" in r.getMessage() for r in caplog.records) == 2
+    assert writer._queue.qsize() == 1
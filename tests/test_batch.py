@@ -0,0 +1,71 @@
+import pytest
+
+from app.libs import jwt as jwt_module
+
+
+def batch(client, entries, headers=None):
+    return client.post("/batch", json={"requests": entries}, headers=headers).get_json()
+
+
+def test_results_keep_request_order(client):
+    data = batch(client, [
+        {"id": "a", "path": "/projects"},
+        {"id": "b", "path": "/spiders?project=project_0"},
+        {"id": "c", "path": "/spiders", "params": {"project": "project_1"}},
+    ])["data"]
+    assert [r["id"] for r in data] == ["a", "b", "c"]
+    assert all(r["status"] == 200 and r["body"]["code"] == 200 for r in data)
+
+
+@pytest.mark.parametrize("body", [{}, {"requests": []}, {"requests": ["/projects"]},
+                                  {"requests": [{"path": "/projects"}] * 51}])
+def test_invalid_batches(client, body):
+    assert client.post("/batch", json=body).get_json()["code"] == 400
+
+
+def test_invalid_token_rejects_whole_batch(client):
+    response = client.post("/batch", json={"requests": [{"path": "/projects"}]},
+                           headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("entry,status", [
+    ({"path": "/no/such/path"}, 404),
+    ({"path": "/projects", "method": "DELETE"}, 405),
+    ({"path": "/api/user/profile"}, 404),
+    ({"path": "projects"}, 400),
+    ({"path": "/projects", "method": "PATCH"}, 400),
+    ({"path": "/spiders?project=a", "params": {"project": "b"}}, 400),
+    ({"path": "/spiders", "params": ["project"]}, 400),
+])
+def test_rejected_sub_requests_return_json(client, entry, status):
+    result = batch(client, [entry])["data"][0]
+    assert result["status"] == status
+    assert result["body"]["code"] == status
+    assert isinstance(result["body"]["message"], str)
+
+
+def test_sub_requests_reuse_the_verified_token(app, client, make_user, monkeypatch):
+    headers = make_user("root", scope="admin")
+    # 关闭令牌缓存，确保子请求不是通过缓存跳过校验
+    jwt_module.token_cache.configure(0)
+    calls = []
+    original = jwt_module.verify_jwt_in_request
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(jwt_module, "verify_jwt_in_request", counting)
+    try:
+        data = batch(client, [{"path": "/cancel/bulk", "method": "POST", "body": {"project": "project_1"}}] * 3,
+                     headers=headers)["data"]
+    finally:
+        jwt_module.token_cache.configure(app.config["JWT_TOKEN_CACHE_SIZE"])
+    assert [r["status"] for r in data] == [200] * 3
+    assert len(calls) == 1
+
+
+def test_sub_requests_without_token_are_anonymous(client):
+    result = batch(client, [{"path": "/cancel/bulk", "method": "POST", "body": {"project": "project_1"}}])
+    assert result["data"][0]["status"] == 401
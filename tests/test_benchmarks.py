@@ -0,0 +1,57 @@
+import json
+
+import pytest
+import requests
+
+from benchmarks import report, scenarios
+
+
+def test_percentile_interpolates():
+    assert report.percentile([], 50) == 0.0
+    assert report.percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert report.percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+def test_is_error_checks_json_code():
+    assert report.is_error(500, None)
+    assert report.is_error(200, {"code": 404, "message": "作业不存在"})
+    assert not report.is_error(200, {"code": 200, "data": []})
+    assert not report.is_error(201, {"msg": "注册成功"})
+
+
+def test_summarize_counts_errors():
+    result = report.summarize("s", [0.1, 0.2], [200, 200], 1.0, 0, 0, errors=1)
+    assert result["errors"] == 1
+    assert result["error_rate"] == 0.5
+    assert result["status_codes"] == {"200": 2}
+
+
+def test_format_table_notes_disabled_ratelimit():
+    document = {"options": {"ratelimit_enabled": False},
+                "scenarios": [report.summarize("s", [0.1], [200], 1.0, 0, 0)]}
+    assert "RATELIMIT_ENABLED=False" in report.format_table(document)
+
+
+def test_select_rejects_unknown_scenario():
+    assert [s.name for s in scenarios.select(["jobs"])] == ["jobs"]
+    with pytest.raises(ValueError):
+        scenarios.select(["no_such_scenario"])
+
+
+def test_fake_scrapyd_routes(scrapyd):
+    projects = requests.get(f"{scrapyd.url}/listprojects.json").json()
+    assert projects["projects"] == ["project_0", "project_1"]
+    jobs = requests.get(f"{scrapyd.url}/listjobs.json", params={"project": "project_0"}).json()
+    assert sum(len(jobs[s]) for s in ("pending", "running", "finished")) == 20
+    items = requests.get(f"{scrapyd.url}/items/project_0/spider_0/project_0-00000001.jl").content
+    assert len(items.splitlines()) == 50
+    json.loads(items.splitlines()[0])
+    assert requests.get(f"{scrapyd.url}/nothing.json").status_code == 404
+
+
+def test_scenarios_succeed_against_app(app, scrapyd):
+    client = app.test_client()
+    for name in ("projects", "jobs", "status", "versions"):
+        scenario = scenarios.select([name])[0]
+        response = client.open(**scenario.build(0))
+        assert not report.is_error(response.status_code, response.get_json(silent=True)), name
@@ -0,0 +1,73 @@
+import pytest
+
+from app.scrapyd_client.cluster import bulk_cancel
+from app.scrapyd_client.client import ScrapydClient
+
+
+@pytest.fixture
+def active_jobs(scrapyd):
+    jobs = scrapyd.data.jobs("project_0")
+    return {state: jobs[state] for state in ("pending", "running")}
+
+
+def test_bulk_cancel_requires_token(client):
+    response = client.post("/cancel/bulk", json={"project": "project_0"})
+    assert response.status_code == 401
+
+
+def test_bulk_cancel_requires_admin(client, make_user):
+    response = client.post("/cancel/bulk", json={"project": "project_0"}, headers=make_user())
+    assert response.status_code == 403
+
+
+def test_bulk_cancel_validates_states(client, make_user):
+    response = client.post("/cancel/bulk", json={"project": "project_0", "states": ["finished"]},
+                           headers=make_user("root", scope="admin"))
+    assert response.get_json()["code"] == 400
+
+
+@pytest.mark.parametrize("body", [
+    {"job_ids": 5}, {"job_ids": "abc"}, {"job_ids": [1]}, {"nodes": "1"}, {"nodes": [True]}, {"states": 5},
+])
+def test_bulk_cancel_validates_lists(client, make_user, body):
+    response = client.post("/cancel/bulk", json={"project": "project_0", **body},
+                           headers=make_user("root", scope="admin"))
+    assert response.status_code == 200
+    assert response.get_json()["code"] == 400
+
+
+def test_bulk_cancel_through_login(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "ADMIN_USERS", ["root"])
+    client.post("/api/user/register", json={"username": "root", "password": "password"})
+    token = client.post("/api/user/login", json={"username": "root", "password": "password"}).get_json()
+    response = client.post("/cancel/bulk", json={"project": "project_1", "job_ids": ["missing"]},
+                           headers={"Authorization": f"Bearer {token['access_token']}"})
+    assert response.get_json()["data"]["matched"] == 0
+
+
+def test_bulk_cancel_cancels_active_jobs(client, make_user, active_jobs):
+    response = client.post("/cancel/bulk", json={"project": "project_0"},
+                           headers=make_user("root", scope="admin"))
+    data = response.get_json()["data"]
+    expected = {job["id"] for jobs in active_jobs.values() for job in jobs}
+    assert data["matched"] == len(expected)
+    assert {job["job_id"] for job in data["cancelled"]} == expected
+    assert data["failed"] == []
+
+
+def test_bulk_cancel_filters(app, scrapyd, active_jobs):
+    node = ScrapydClient(scrapyd.url, name="a")
+    running = active_jobs["running"]
+    with app.app_context():
+        result = bulk_cancel("project_0", [node], 4, states=["running"])
+        assert {job["job_id"] for job in result["cancelled"]} == {job["id"] for job in running}
+        result = bulk_cancel("project_0", [node], 4, job_ids=["missing"])
+        assert result["matched"] == 0
+
+
+def test_bulk_cancel_reports_unreachable_nodes(app):
+    node = ScrapydClient("http://127.0.0.1:1", name="down")
+    with app.app_context():
+        result = bulk_cancel("project_0", [node], 4)
+    assert result["matched"] == 0
+    assert [entry["node"] for entry in result["failed"]] == ["down"]
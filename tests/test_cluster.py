@@ -0,0 +1,125 @@
+import io
+
+import pytest
+
+from app.models.base import db
+from app.models.scrapyd import ScrapydModel
+from app.scrapyd_client.cluster import get_clients, store_egg
+
+
+def add_node(url: str, name: str, enable: int = 1) -> int:
+    node = ScrapydModel()
+    node.server_url = url
+    node.server_name = name
+    node.enable = enable
+    db.session.add(node)
+    db.session.commit()
+    return node.id
+
+
+def deploy_form(version: str = "r1", **extra):
+    return {"project": "project_0", "version": version,
+            "egg": (io.BytesIO(b"egg-content"), "project.egg"), **extra}
+
+
+def test_get_clients_falls_back_to_default_client(app):
+    with app.app_context():
+        clients = get_clients()
+    assert len(clients) == 1
+
+
+def test_get_clients_deduplicates_nodes_by_url(app, scrapyd):
+    with app.app_context():
+        add_node(scrapyd.url, "a")
+        add_node(scrapyd.url + "/", "b")
+        add_node("http://127.0.0.1:1", "disabled", enable=0)
+        clients = get_clients()
+    assert [c.name for c in clients] == ["a"]
+
+
+def test_store_egg_is_content_addressed(tmp_path):
+    first = store_egg(io.BytesIO(b"same"), str(tmp_path))
+    second = store_egg(io.BytesIO(b"same"), str(tmp_path))
+    assert first == second
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{first[0]}.egg"]
+
+
+def test_store_egg_removes_partial_upload(tmp_path):
+    class BrokenStream:
+        def read(self, size):
+            raise OSError("connection reset")
+
+    with pytest.raises(OSError):
+        store_egg(BrokenStream(), str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_deploy_requires_token(client):
+    response = client.post("/deploy", data=deploy_form(), content_type="multipart/form-data")
+    assert response.status_code == 401
+
+
+def test_deploy_requires_admin(client, make_user):
+    response = client.post("/deploy", data=deploy_form(), headers=make_user(),
+                           content_type="multipart/form-data")
+    assert response.status_code == 403
+
+
+def test_deploy_skips_unchanged_egg(app, client, make_user, scrapyd):
+    headers = make_user("root", scope="admin")
+    with app.app_context():
+        add_node(scrapyd.url, "a")
+        add_node(scrapyd.url, "a-copy")
+
+    first = client.post("/deploy", data=deploy_form(), headers=headers,
+                        content_type="multipart/form-data").get_json()
+    assert first["code"] == 200
+    assert [r["status"] for r in first["data"]["results"]] == ["deployed"]
+
+    second = client.post("/deploy", data=deploy_form(), headers=headers,
+                         content_type="multipart/form-data").get_json()
+    assert [(r["status"], r["version"]) for r in second["data"]["results"]] == [("skipped", "r1")]
+
+    # 内容相同但版本号不同时以新版本号部署
+    renamed = client.post("/deploy", data=deploy_form("r2"), headers=headers,
+                          content_type="multipart/form-data").get_json()
+    assert [(r["status"], r["version"]) for r in renamed["data"]["results"]] == [("deployed", "r2")]
+
+    forced = client.post("/deploy", data=deploy_form("r2", force="1"), headers=headers,
+                         content_type="multipart/form-data").get_json()
+    assert [r["status"] for r in forced["data"]["results"]] == ["deployed"]
+
+
+def test_deploy_requires_egg(client, make_user):
+    response = client.post("/deploy", data={"project": "project_0"},
+                           headers=make_user("root", scope="admin"))
+    assert response.get_json()["code"] == 400
+
+
+def login(client, username):
+    client.post("/api/user/register", json={"username": username, "password": "password"})
+    tokens = client.post("/api/user/login", json={"username": username, "password": "password"}).get_json()
+    return tokens["access_token"], tokens["refresh_token"]
+
+
+def test_admin_scope_is_granted_through_login(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "ADMIN_USERS", ["root"])
+    admin_token, refresh_token = login(client, "root")
+    user_token, _ = login(client, "alice")
+
+    def deploy_status(token):
+        return client.post("/deploy", data=deploy_form(), headers={"Authorization": f"Bearer {token}"},
+                           content_type="multipart/form-data").status_code
+
+    assert deploy_status(user_token) == 403
+    assert deploy_status(admin_token) == 200
+    # 刷新后的令牌保留管理员访问级别
+    refreshed = client.post("/api/user/refresh", headers={"Authorization": f"Bearer {refresh_token}"})
+    assert refreshed.status_code == 200
+    assert deploy_status(refreshed.get_json()["access_token"]) == 200
+
+
+def test_delete_project_requires_admin(client, make_user):
+    assert client.delete("/project", query_string={"project": "project_1"}).status_code == 401
+    response = client.delete("/project", query_string={"project": "project_1"}, headers=make_user())
+    assert response.status_code == 403
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from app.scrapyd_client.item_diff import ItemFingerprinter, diff_items
+
+
+def lines(*items):
+    return [json.dumps(item).encode() for item in items]
+
+
+BASE = lines({"id": 1, "price": 10, "ts": 1}, {"id": 2, "price": 20, "ts": 1}, {"id": 3, "price": 30, "ts": 1})
+NEW = lines({"ts": 2, "price": 10, "id": 1}, {"id": 2, "price": 25, "ts": 2}, {"id": 4, "price": 40, "ts": 2})
+
+
+def test_requires_key_fields():
+    with pytest.raises(ValueError):
+        ItemFingerprinter([])
+
+
+def test_fingerprint_ignores_field_order():
+    fingerprinter = ItemFingerprinter(["id"])
+    assert fingerprinter.fingerprint(b'{"id": 1, "a": 2}') == fingerprinter.fingerprint(b'{"a": 2, "id": 1}')
+    assert fingerprinter.fingerprint(b"not json") is None
+    assert fingerprinter.fingerprint(b"[1, 2]") is None
+
+
+def test_diff_classifies_items():
+    result = diff_items(lambda: BASE, NEW, ItemFingerprinter(["id"], ["ts"]))
+    assert result["added"] == [4]
+    assert result["removed"] == [3]
+    assert result["changed"] == [2]
+    assert result["counts"]["unchanged"] == 1
+
+
+def test_ignored_fields_are_compared_when_not_listed():
+    result = diff_items(lambda: BASE, NEW, ItemFingerprinter(["id"]))
+    assert sorted(result["changed"]) == [1, 2]
+
+
+def test_composite_keys_duplicates_and_invalid_lines():
+    base = lines({"a": 1, "b": 1}, {"a": 1, "b": 2})
+    new = lines({"a": 1, "b": 2}, {"a": 1, "b": 2}) + [b"garbage"]
+    result = diff_items(lambda: base, new, ItemFingerprinter(["a", "b"]))
+    assert result["removed"] == [[1, 1]]
+    assert result["counts"]["duplicate"] == 1
+    assert result["counts"]["invalid"] == 1
+
+
+def test_limit_caps_lists_but_not_counts():
+    base = lines(*({"id": i} for i in range(10)))
+    result = diff_items(lambda: base, [], ItemFingerprinter(["id"]), limit=3)
+    assert len(result["removed"]) == 3
+    assert result["counts"]["removed"] == 10
+
+
+def test_base_is_read_again_only_when_items_were_removed():
+    reads = []
+
+    def base():
+        reads.append(1)
+        return BASE
+
+    diff_items(base, BASE, ItemFingerprinter(["id"]))
+    assert len(reads) == 1
+
+
+def test_diff_endpoint(client, scrapyd):
+    jobs = scrapyd.data.jobs("project_0")["finished"]
+    args = {"project": "project_0", "spider": jobs[0]["spider"], "base_job_id": jobs[0]["id"],
+            "job_id": jobs[1]["id"], "key": "url"}
+    response = client.get("/job/items/diff", query_string=args).get_json()
+    assert response["code"] == 200
+    counts = response["data"]["counts"]
+    assert counts["base"] == counts["new"] == 50
+    assert counts["added"] + counts["changed"] + counts["unchanged"] + counts["duplicate"] == counts["new"]
+
+    response = client.get("/job/items/diff", query_string={**args, "key": ""}).get_json()
+    assert response["code"] == 400
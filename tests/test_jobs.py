@@ -0,0 +1,119 @@
+import pytest
+
+from app.scrapyd_client.jobs import (
+    MISSING_TIME, JobIndex, JobIndexCache, decode_cursor, encode_cursor, parse_time
+)
+
+JOBS = {
+    "pending": [{"id": "p1", "spider": "a"}],
+    "running": [{"id": "r1", "spider": "b", "start_time": "2024-01-01 10:00:00"}],
+    "finished": [
+        {"id": f"f{i}", "spider": "a" if i % 2 else "b", "start_time": f"2024-01-01 0{i}:00:00",
+         "end_time": f"2024-01-01 0{i}:30:00"}
+        for i in range(8)
+    ],
+}
+
+
+def test_parse_time():
+    assert parse_time("1700000000.5") == 1700000000.5
+    assert parse_time("2024-01-01 00:00:00") < parse_time("2024-01-01 00:00:01")
+    assert parse_time(None) == MISSING_TIME
+    assert parse_time("yesterday") == MISSING_TIME
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor((12.5, "job"))) == (12.5, "job")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_pending_jobs_sort_as_newest():
+    page = JobIndex(JOBS).query(limit=2)
+    assert [job["id"] for job in page["jobs"]] == ["p1", "r1"]
+    assert page["total"] == 10
+
+
+def test_cursor_pages_cover_every_job_once():
+    index = JobIndex(JOBS)
+    for order in ("asc", "desc"):
+        seen, cursor = [], None
+        while True:
+            page = index.query(order=order, limit=3, cursor=cursor)
+            seen += [job["id"] for job in page["jobs"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert len(seen) == len(set(seen)) == 10
+        times = [parse_time(next(j for js in JOBS.values() for j in js if j["id"] == i).get("start_time"))
+                 for i in seen]
+        assert times == sorted(times, reverse=order == "desc")
+
+
+def test_filters():
+    index = JobIndex(JOBS)
+    page = index.query(spiders=["a"], statuses=["finished"], limit=100)
+    assert {job["id"] for job in page["jobs"]} == {"f1", "f3", "f5", "f7"}
+    assert all(job["status"] == "finished" for job in page["jobs"])
+
+    since, until = parse_time("2024-01-01 02:00:00"), parse_time("2024-01-01 04:00:00")
+    page = index.query(since=since, until=until, order="asc", limit=100)
+    assert [job["id"] for job in page["jobs"]] == ["f2", "f3", "f4"]
+
+    page = index.query(sort="end_time", statuses=["finished"], limit=1)
+    assert page["jobs"][0]["id"] == "f7"
+
+
+class CountingNode:
+    target = "http://node"
+
+    def __init__(self):
+        self.calls = 0
+
+    def list_jobs(self, project):
+        self.calls += 1
+        return JOBS
+
+
+def test_cache_reuses_index_between_pages():
+    cache = JobIndexCache(ttl=60)
+    node = CountingNode()
+    first = cache.get(node, "p")
+    assert cache.get(node, "p") is first
+    assert cache.get(node, "other") is not first
+    assert node.calls == 2
+
+    cache.invalidate(node, "p")
+    assert cache.get(node, "p") is not first
+    assert node.calls == 3
+
+
+def test_cache_expires_after_ttl():
+    cache = JobIndexCache(ttl=0)
+    node = CountingNode()
+    cache.get(node, "p")
+    cache.get(node, "p")
+    assert node.calls == 2
+
+
+def test_jobs_endpoint_paginates(client, scrapyd):
+    jobs = scrapyd.data.jobs("project_0")
+    total = sum(len(v) for v in jobs.values())
+    seen, cursor = [], None
+    while True:
+        args = {"project": "project_0", "limit": 7, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/jobs", query_string=args).get_json()["data"]
+        assert data["total"] == total
+        seen += [job["id"] for job in data["jobs"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(job["id"] for v in jobs.values() for job in v)
+
+
+@pytest.mark.parametrize("args", [
+    {"status": "done"}, {"sort": "id"}, {"order": "up"}, {"since": "someday"}, {"cursor": "bad"},
+])
+def test_jobs_endpoint_rejects_bad_filters(client, args):
+    response = client.get("/jobs", query_string={"project": "project_0", **args})
+    assert response.get_json()["code"] == 400
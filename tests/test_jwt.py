@@ -0,0 +1,100 @@
+import time
+
+from flask_jwt_extended import create_access_token
+
+from app.libs import jwt as jwt_module
+from app.libs.cache import LRUCache
+from app.models.base import db
+from app.models.users import UsersModel
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache("test", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    cache.configure(1)
+    assert len(cache) == 1
+
+
+def test_lru_cache_expiry():
+    cache = LRUCache("test", maxsize=4, ttl=60)
+    cache.set("default", 1)
+    cache.set("expired", 2, expires_at=time.time() - 1)
+    assert cache.get("default") == 1
+    assert cache.get("expired") is None
+    disabled = LRUCache("test", maxsize=0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+
+def token_for(app, user_id: int, **claims) -> dict:
+    with app.app_context():
+        token = create_access_token(identity=str(user_id), additional_claims=claims)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_profile_uses_database_username(client, make_user):
+    headers = make_user("alice")
+    data = client.get("/api/user/profile", headers=headers).get_json()
+    assert data["username"] == "alice"
+
+
+def test_is_active_comes_from_the_user_row(app, client, make_user):
+    make_user("alice")
+    # 刷新后签发的令牌不带is_active声明
+    assert client.get("/api/user/profile", headers=token_for(app, 1)).status_code == 200
+    assert client.get("/api/user/profile", headers=token_for(app, 1, is_active=False)).status_code == 200
+
+    with app.app_context():
+        db.session.get(UsersModel, 1).status = 0
+        db.session.commit()
+    assert client.get("/api/user/profile", headers=token_for(app, 1, is_active=True)).status_code == 403
+
+
+def test_unknown_user_is_rejected(app, client):
+    assert client.get("/api/user/profile", headers=token_for(app, 42)).status_code == 401
+
+
+def test_user_cache_is_invalidated_on_commit_not_flush(app, make_user):
+    make_user("alice")
+    with app.app_context():
+        assert jwt_module._load_user_record(1)["username"] == "alice"
+        user = db.session.get(UsersModel, 1)
+        user.nickname = "bob"
+        db.session.flush()
+        assert jwt_module.user_cache.get("1")["username"] == "alice"
+        db.session.commit()
+        assert jwt_module.user_cache.get("1") is None
+        assert jwt_module._load_user_record(1)["username"] == "bob"
+
+        user.nickname = "carol"
+        db.session.flush()
+        db.session.rollback()
+        assert jwt_module.user_cache.get("1")["username"] == "bob"
+        assert jwt_module.CHANGED_USERS_KEY not in db.session.info
+
+
+def test_verified_tokens_are_cached(client, make_user, monkeypatch):
+    headers = make_user("alice")
+    calls = []
+    original = jwt_module.verify_jwt_in_request
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(jwt_module, "verify_jwt_in_request", counting)
+    for _ in range(3):
+        assert client.get("/api/user/profile", headers=headers).status_code == 200
+    assert len(calls) == 1
+
+
+def test_revoked_token_is_rejected_even_when_cached(client, make_user):
+    headers = make_user("alice")
+    assert client.get("/api/user/profile", headers=headers).status_code == 200
+    assert client.post("/api/user/logout", headers=headers).status_code == 200
+    assert client.get("/api/user/profile", headers=headers).status_code == 401
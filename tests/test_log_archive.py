@@ -0,0 +1,150 @@
+import os
+import struct
+import threading
+
+import pytest
+
+from app.scrapyd_client.log_archive import (
+    FOOTER, HEADER, MAGIC, ArchiveFormatError, ArchiveReader, LogArchive, get_archive, write_archive
+)
+
+CONTENT = b"".join(f"line {i:05d} of the crawl log\n".encode() for i in range(2000))
+
+
+@pytest.fixture
+def archive_path(tmp_path):
+    path = str(tmp_path / "job.log.z")
+    write_archive(path, [CONTENT[i:i + 777] for i in range(0, len(CONTENT), 777)], block_size=4096)
+    return path
+
+
+def test_archive_layout(archive_path):
+    with open(archive_path, "rb") as f:
+        raw = f.read()
+    magic, block_size = HEADER.unpack_from(raw, 0)
+    index_offset, blocks, size, tail = FOOTER.unpack_from(raw, len(raw) - FOOTER.size)
+    assert (magic, tail, block_size, size) == (MAGIC, MAGIC, 4096, len(CONTENT))
+    assert blocks == -(-len(CONTENT) // 4096)
+    assert index_offset + blocks * 12 + FOOTER.size == len(raw)
+
+
+@pytest.mark.parametrize("offset,length", [
+    (0, None), (0, 10), (4090, 20), (4096, 4096), (len(CONTENT) - 5, 100), (len(CONTENT) + 10, 5), (100, 0),
+])
+def test_range_reads(archive_path, offset, length):
+    with ArchiveReader(archive_path) as reader:
+        expected = CONTENT[offset:] if length is None else CONTENT[offset:offset + length]
+        assert reader.read(offset, length) == expected
+
+
+def test_empty_content(tmp_path):
+    path = str(tmp_path / "empty.z")
+    assert write_archive(path, []) == 0
+    with ArchiveReader(path) as reader:
+        assert reader.size == 0
+        assert reader.read() == b""
+
+
+def test_corrupt_archive_is_rejected(tmp_path, archive_path):
+    with open(archive_path, "r+b") as f:
+        f.seek(-8, os.SEEK_END)
+        f.write(b"XXXXXXXX")
+    with pytest.raises(ArchiveFormatError):
+        ArchiveReader(archive_path)
+    empty = tmp_path / "zero.z"
+    empty.write_bytes(b"")
+    with pytest.raises(ArchiveFormatError):
+        ArchiveReader(str(empty))
+    short = tmp_path / "short.z"
+    short.write_bytes(struct.pack("<8s", MAGIC))
+    with pytest.raises(ArchiveFormatError):
+        ArchiveReader(str(short))
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    def chunks():
+        yield b"partial"
+        raise RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError):
+        write_archive(str(tmp_path / "job.z"), chunks())
+    assert os.listdir(tmp_path) == []
+
+
+def test_path_rejects_traversal(tmp_path):
+    archive = LogArchive(str(tmp_path))
+    assert archive.path("..", "spider", "job") is None
+    assert archive.path("project", "a/b", "job") is None
+    assert archive.path("project", "spider", "job").endswith(os.path.join("project", "spider", "job.log.z"))
+
+
+class SlowNode:
+    """只允许拉取一次日志的节点"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def iter_log(self, project, spider, job_id, log_type):
+        self.calls += 1
+        self.release.wait(5)
+        yield CONTENT
+
+
+def test_concurrent_archive_fetches_once(tmp_path):
+    archive = LogArchive(str(tmp_path), block_size=4096)
+    node = SlowNode()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(archive.archive(node, "p", "s", "j")))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    node.release.set()
+    for thread in threads:
+        thread.join()
+    assert node.calls == 1
+    assert sorted(results) == [False] * 5 + [True]
+    assert archive._locks == {}
+
+
+def finished_job(scrapyd):
+    job = scrapyd.data.jobs("project_0")["finished"][0]
+    return {"project": "project_0", "spider": job["spider"], "job_id": job["id"]}
+
+
+def test_log_rejects_negative_range(client, scrapyd):
+    args = finished_job(scrapyd)
+    for extra in ({"offset": -1}, {"length": -5}):
+        response = client.get("/log", query_string={**args, **extra})
+        assert response.get_json()["code"] == 400
+
+
+def test_log_read_does_not_archive(app, client, scrapyd):
+    args = finished_job(scrapyd)
+    response = client.get("/log", query_string=args).get_json()
+    assert response["code"] == 200
+    with app.app_context():
+        assert not get_archive().has(args["project"], args["spider"], args["job_id"])
+
+
+def test_stats_does_not_archive(app, client, scrapyd):
+    args = finished_job(scrapyd)
+    stats = client.get("/job/stats", query_string={"project": args["project"], "job_id": args["job_id"]})
+    assert stats.get_json()["data"]["status"] == "finished"
+    with app.app_context():
+        assert not get_archive().has(args["project"], args["spider"], args["job_id"])
+
+
+def test_archive_command_then_log_reads_archive(app, client, scrapyd):
+    args = finished_job(scrapyd)
+    full = client.get("/log", query_string=args).get_json()["data"]
+
+    output = app.test_cli_runner().invoke(args=["archive-logs", "--project", args["project"]]).output
+    assert "失败 0" in output
+    with app.app_context():
+        assert get_archive().has(args["project"], args["spider"], args["job_id"])
+
+    assert client.get("/log", query_string=args).get_json()["data"] == full
+    part = client.get("/log", query_string={**args, "offset": 10, "length": 20}).get_json()
+    assert part["data"] == full.encode()[10:30].decode()
+    assert part["size"] == len(full.encode())
@@ -0,0 +1,57 @@
+import pytest
+
+from app.libs import metrics
+from app.scrapyd_client.client import ScrapydClient
+
+
+def test_counter_and_gauge_render():
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter("t_total", "测试计数", ("kind",)))
+    gauge = registry.register(metrics.Gauge("t_gauge", "测试仪表"))
+    counter.labels('a"b').inc()
+    counter.labels('a"b').inc(2)
+    gauge.labels().inc()
+    gauge.labels().dec()
+    text = registry.render()
+    assert '# TYPE t_total counter' in text
+    assert 't_total{kind="a\\"b"} 3' in text
+    assert 't_gauge 0' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    histogram = registry.register(metrics.Histogram("t_seconds", "测试直方图", (), (0.1, 1.0)))
+    for value in (0.05, 0.5, 5):
+        histogram.labels().observe(value)
+    text = registry.render()
+    assert 't_seconds_bucket{le="0.1"} 1' in text
+    assert 't_seconds_bucket{le="1"} 2' in text
+    assert 't_seconds_bucket{le="+Inf"} 3' in text
+    assert "t_seconds_count 3" in text
+
+
+def test_labels_require_matching_arity():
+    counter = metrics.Counter("t_arity_total", "测试", ("a", "b"))
+    with pytest.raises(ValueError):
+        counter.labels("only-one")
+
+
+def test_scrapyd_endpoint_label_collapses_paths():
+    assert metrics.scrapyd_endpoint_label("logs/p/s/j.log") == "logs"
+    assert metrics.scrapyd_endpoint_label("listjobs.json") == "listjobs.json"
+
+
+def test_node_alias_hides_url():
+    node = ScrapydClient("http://10.0.0.5:6800")
+    assert node.alias.startswith("node-")
+    assert "10.0.0.5" not in node.alias
+    assert ScrapydClient("http://10.0.0.5:6800", name="crawler-1").alias == "crawler-1"
+
+
+def test_metrics_endpoint_does_not_expose_node_urls(client, scrapyd):
+    assert client.get("/projects").status_code == 200
+    text = client.get("/metrics").get_data(as_text=True)
+    assert "webspider_http_request_duration_seconds" in text
+    assert "webspider_scrapyd_request_duration_seconds" in text
+    assert scrapyd.url not in text
+    assert "127.0.0.1" not in text
@@ -0,0 +1,61 @@
+import cProfile
+import os
+import marshal
+
+from app.libs.profiler import ProfileStore
+
+
+def test_admin_can_profile_a_request(client, make_user):
+    admin = make_user("root", scope="admin")
+    response = client.get("/projects", headers={**admin, "X-Profile": "cprofile"})
+    profile_id = response.headers.get("X-Profile-Id")
+    assert profile_id
+
+    listed = client.get("/api/profiles", headers=admin).get_json()["data"]
+    assert [p["id"] for p in listed] == [profile_id]
+    assert listed[0]["endpoint"] == "spider_api.get_projects"
+
+    download = client.get(f"/api/profiles/{profile_id}", headers=admin)
+    assert download.status_code == 200
+    assert marshal.loads(download.data)
+
+
+def test_sample_mode_writes_folded_stacks(client, make_user, app):
+    admin = make_user("root", scope="admin")
+    profile_id = client.get("/jobs?project=project_0&__profile=sample", headers=admin).headers["X-Profile-Id"]
+    with app.app_context():
+        path = app.extensions["profile_store"].path(profile_id)
+    assert path.endswith(".folded")
+
+
+def test_busy_cprofile_falls_back_to_sampling(client, make_user, app, monkeypatch):
+    class BusyProfile(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile, "Profile", BusyProfile)
+    admin = make_user("root", scope="admin")
+    response = client.get("/projects", headers={**admin, "X-Profile": "cprofile"})
+    assert response.status_code == 200
+    with app.app_context():
+        assert app.extensions["profile_store"].path(response.headers["X-Profile-Id"]).endswith(".folded")
+
+
+def test_non_admin_requests_are_not_profiled(client, make_user):
+    user = make_user()
+    response = client.get("/projects", headers={**user, "X-Profile": "cprofile"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/api/profiles", headers=user).status_code == 403
+
+
+def test_store_retention_and_path_checks(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    for i in range(3):
+        store.save(f"p{i}", "sample", b"a;b 1\n", {"id": f"p{i}"})
+        os.utime(tmp_path / f"p{i}.json", (i, i))
+    store._enforce_retention()
+    assert [m["id"] for m in store.list()] == ["p2", "p1"]
+    assert store.path("p0") is None
+    assert store.path("../p1") is None
+    assert store.path("p1").endswith("p1.folded")
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from app.config import Testing
+from app.libs.ratelimit import ConcurrencySlots, RateLimiter, TokenBucketStore
+
+
+@pytest.fixture(autouse=True)
+def ratelimit_config(monkeypatch):
+    monkeypatch.setattr(Testing, "RATELIMIT_ENABLED", True)
+    monkeypatch.setattr(Testing, "RATELIMIT_CLASSES", {
+        "default": {"rate": 0.01, "burst": 3},
+        "expensive": {"rate": 100.0, "burst": 100},
+    })
+    monkeypatch.setattr(Testing, "RATELIMIT_CONCURRENCY", {"expensive": 1})
+
+
+def test_token_bucket_allows_burst_then_waits(tmp_path):
+    store = TokenBucketStore(str(tmp_path / "buckets.db"))
+    assert [store.take("k", rate=2.0, burst=3) for _ in range(3)] == [0.0] * 3
+    wait = store.take("k", rate=2.0, burst=3)
+    assert 0 < wait <= 0.5
+    assert store.take("other", rate=2.0, burst=3) == 0.0
+
+
+def test_token_bucket_is_shared_between_threads(tmp_path):
+    store = TokenBucketStore(str(tmp_path / "buckets.db"))
+    results = []
+    lock = threading.Lock()
+
+    def take():
+        wait = store.take("k", rate=0.001, burst=10)
+        with lock:
+            results.append(wait)
+
+    threads = [threading.Thread(target=take) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(0.0) == 10
+
+
+def test_concurrency_slots(tmp_path):
+    slots = ConcurrencySlots(str(tmp_path), "expensive", 2)
+    first, second = slots.acquire(), slots.acquire()
+    assert first is not None and second is not None
+    assert slots.acquire() is None
+    slots.release(first)
+    third = slots.acquire()
+    assert third is not None
+    slots.release(second)
+    slots.release(third)
+
+
+def test_classify_and_storage_errors_allow_requests(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "missing" / "dir"), {"default": {"rate": 1, "burst": 1}},
+                          {"metrics": "exempt"}, {})
+    assert limiter.classify("metrics") is None
+    assert limiter.classify("spider_api.get_projects") == "default"
+    # 目录被同名文件占用时数据库无法打开，限流退化为放行
+    (tmp_path / "blocked").write_text("")
+    limiter.buckets.path = str(tmp_path / "blocked" / "buckets.db")
+    assert limiter.check_rate("default", "user:1") == 0.0
+
+
+def test_requests_over_the_limit_get_429(client):
+    statuses = [client.get("/status").status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    response = client.get("/status")
+    assert response.get_json()["code"] == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_identities_have_separate_buckets(client, make_user):
+    headers = make_user()
+    for _ in range(3):
+        client.get("/status")
+    assert client.get("/status").status_code == 429
+    assert client.get("/status", headers=headers).status_code == 200
+
+
+def test_exempt_endpoints_are_not_limited(client):
+    assert all(client.get("/metrics").status_code == 200 for _ in range(5))
+
+
+def test_expensive_requests_need_a_free_slot(app, client, scrapyd):
+    job = scrapyd.data.jobs("project_0")["finished"][0]
+    args = {"project": "project_0", "spider": job["spider"], "job_id": job["id"]}
+    slots = app.extensions["ratelimit"].slots["expensive"]
+    handle = slots.acquire()
+    try:
+        response = client.get("/log", query_string=args)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        slots.release(handle)
+    assert client.get("/log", query_string=args).status_code == 200
+
+
+def test_slot_errors_allow_requests(app, client, monkeypatch):
+    slots = app.extensions["ratelimit"].slots["expensive"]
+
+    def broken():
+        raise OSError(24, "Too many open files")
+
+    monkeypatch.setattr(slots, "acquire", broken)
+    args = {"project": "project_0", "spider": "spider_0", "job_id": "missing"}
+    assert client.get("/log", query_string=args).status_code == 200
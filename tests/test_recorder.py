@@ -0,0 +1,124 @@
+import glob
+import json
+import os
+
+import pytest
+
+from app.config import Testing
+from app.libs.recorder import REDACTED, sanitize
+from benchmarks import replay
+
+
+@pytest.fixture(autouse=True)
+def recording(monkeypatch):
+    monkeypatch.setattr(Testing, "RECORDER_ENABLED", True)
+
+
+def recorded(app):
+    records = []
+    for path in glob.glob(os.path.join(app.config["RECORDER_DIR"], "traffic-*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    return sorted(records, key=lambda r: r["t"])
+
+
+def test_sanitize():
+    value = {"user": "a", "Password": "x", "nested": [{"api_token": "t", "ok": 1}], "list": ("s",)}
+    assert sanitize(value) == {"user": "a", "Password": REDACTED,
+                               "nested": [{"api_token": REDACTED, "ok": 1}], "list": ["s"]}
+
+
+def test_requests_are_recorded_without_secrets(app, client, make_user):
+    headers = make_user()
+    client.post("/schedule", json={"project": "project_0", "spider": "spider_0",
+                                   "settings": {"HTTP_PASSWORD": "hunter2"}}, headers=headers)
+    client.get("/projects")
+    client.get("/metrics")
+
+    schedule, projects = recorded(app)
+    assert schedule["endpoint"] == "spider_api.schedule"
+    assert schedule["json"]["settings"]["HTTP_PASSWORD"] == REDACTED
+    assert schedule["identity"] not in (None, "1")
+    assert projects["identity"] is None
+    call = projects["upstream"][0]
+    assert call["endpoint"] == "listprojects.json" and call["status"] == "200"
+    # 默认只记录响应体的大小与哈希
+    assert "body" not in call and len(call["body_hash"]) == 32 and call["size"] > 0
+    assert "hunter2" not in json.dumps(recorded(app))
+
+
+def test_upstream_bodies_are_sanitized_when_enabled(app, client, scrapyd, monkeypatch):
+    monkeypatch.setattr(app.extensions["recorder"], "upstream_bodies", True)
+    job = scrapyd.data.jobs("project_0")["finished"][0]
+    client.get("/projects")
+    client.get("/log", query_string={"project": "project_0", "spider": job["spider"], "job_id": job["id"]})
+
+    projects, log = recorded(app)
+    assert projects["upstream"][0]["body"]["projects"]
+    assert all("body" not in call for call in log["upstream"])
+    assert sum(call["size"] for call in log["upstream"]) > 0
+
+
+def test_concurrent_upstream_calls_are_attributed(app, client, make_user):
+    client.post("/cancel/bulk", json={"project": "project_0"}, headers=make_user("root", scope="admin"))
+    (record,) = recorded(app)
+    endpoints = [call["endpoint"] for call in record["upstream"]]
+    assert endpoints[0] == "listjobs.json"
+    assert endpoints.count("cancel.json") == len(endpoints) - 1 > 0
+
+
+def test_replay_reproduces_recorded_traffic(app, client, make_user, monkeypatch):
+    headers = make_user()
+    for _ in range(3):
+        client.get("/projects", headers=headers)
+        client.get("/spiders", query_string={"project": "project_1"})
+    client.get("/spiders")
+    records = replay.load_recordings(glob.glob(os.path.join(app.config["RECORDER_DIR"], "*.jsonl")))
+    assert len(records) == 7
+
+    monkeypatch.setattr(Testing, "RECORDER_ENABLED", False)
+    server = replay.ReplayScrapydServer(records, latency_scale=0).start()
+    try:
+        identities = sorted({r["identity"] for r in records if r.get("identity")})
+        replay_app, tokens = replay.prepare_app(server.url, identities)
+        results = replay.replay(replay_app, tokens, records, speed=100, concurrency=4)
+    finally:
+        server.stop()
+
+    summary = {result["name"]: result for result in results}
+    assert summary["all"]["requests"] == 7
+    assert summary["all"]["status_mismatches"] == 0
+    # /spiders缺少project参数时返回code 400，计为错误
+    assert summary["all"]["errors"] == 1
+    assert summary["spider_api.get_projects"]["errors"] == 0
+
+
+def test_replay_uses_recorded_scope(app, client, make_user, monkeypatch):
+    admin = make_user("root", scope="admin")
+    client.post("/cancel/bulk", json={"project": "project_1", "job_ids": ["missing"]}, headers=admin)
+    client.get("/projects", headers=make_user("alice"))
+    records = replay.load_recordings(glob.glob(os.path.join(app.config["RECORDER_DIR"], "*.jsonl")))
+    assert [(r["endpoint"], r["scope"], r["status"]) for r in records] == [
+        ("spider_api.cancel_bulk", "admin", 200), ("spider_api.get_projects", "user", 200)]
+
+    monkeypatch.setattr(Testing, "RECORDER_ENABLED", False)
+    server = replay.ReplayScrapydServer(records, latency_scale=0).start()
+    try:
+        replay_app, tokens = replay.prepare_app(server.url, sorted({r["identity"] for r in records}))
+        results = replay.replay(replay_app, tokens, records, speed=100, concurrency=2)
+    finally:
+        server.stop()
+    assert next(r for r in results if r["name"] == "all")["status_mismatches"] == 0
+
+
+def test_replay_raises_request_failures(app, monkeypatch):
+    monkeypatch.setattr(Testing, "RECORDER_ENABLED", False)
+    records = [{"t": 0, "method": "GET", "path": "/projects", "endpoint": "spider_api.get_projects"}]
+
+    def broken(record, token):
+        raise RuntimeError("bad recording")
+
+    monkeypatch.setattr(replay, "build_request", broken)
+    replay_app, tokens = replay.prepare_app("http://127.0.0.1:1", [])
+    with pytest.raises(RuntimeError, match="bad recording"):
+        replay.replay(replay_app, tokens, records, speed=1, concurrency=1)
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pytest
+
+from app.libs.cron import CronExpression
+from app.models.base import db
+from app.models.scrapyd import PeriodicScheduleModel
+from app.scrapyd_client.scheduler import make_trigger
+
+
+@pytest.mark.parametrize("expr", [
+    "* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *", "a * * * *", "* * 0 * *", "* * * 13 *",
+])
+def test_cron_rejects_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        CronExpression(expr)
+
+
+def test_cron_fields():
+    cron = CronExpression("*/15 2-4 * * 0,7")
+    assert cron.minutes == [0, 15, 30, 45]
+    assert cron.hours == [2, 3, 4]
+    assert cron.weekdays == [6]
+
+
+@pytest.mark.parametrize("expr,after,expected", [
+    ("* * * * *", "2024-01-01 10:00:30", "2024-01-01 10:01:00"),
+    ("0 * * * *", "2024-01-01 10:00:00", "2024-01-01 11:00:00"),
+    ("30 2 * * *", "2024-01-01 03:00:00", "2024-01-02 02:30:00"),
+    ("0 0 1 * *", "2024-01-15 00:00:00", "2024-02-01 00:00:00"),
+    ("0 0 29 2 *", "2024-03-01 00:00:00", "2028-02-29 00:00:00"),
+    ("0 9 * * 1-5", "2024-01-05 10:00:00", "2024-01-08 09:00:00"),
+    ("59 23 31 12 *", "2024-12-31 23:59:00", "2025-12-31 23:59:00"),
+])
+def test_cron_next_after(expr, after, expected):
+    assert CronExpression(expr).next_after(datetime.fromisoformat(after)) == datetime.fromisoformat(expected)
+
+
+def test_cron_day_or_weekday():
+    # 日与周同时限定时满足其一即可: 2024-01-03是周三，2024-01-05是5日
+    cron = CronExpression("0 0 5 * 3")
+    assert cron.next_after(datetime(2024, 1, 1)) == datetime(2024, 1, 3)
+    assert cron.next_after(datetime(2024, 1, 3)) == datetime(2024, 1, 5)
+
+
+def test_cron_that_never_fires():
+    with pytest.raises(ValueError):
+        CronExpression("0 0 30 2 *").next_after(datetime(2024, 1, 1))
+
+
+def test_make_trigger():
+    assert make_trigger(None, "60") == 60
+    assert isinstance(make_trigger("*/5 * * * *", None), CronExpression)
+    for cron, interval in ((None, None), ("* * * * *", 60), (None, 0), (None, "soon"), ("0 0 31 2 *", None)):
+        with pytest.raises(ValueError):
+            make_trigger(cron, interval)
+
+
+def create(client, **fields):
+    body = {"project": "project_0", "spider": "spider_0", **fields}
+    return client.post("/periodic", json=body).get_json()
+
+
+def test_create_and_list_periodic(client):
+    created = create(client, cron="*/5 * * * *", settings={"DOWNLOAD_DELAY": 1}, enable=True)
+    assert created["code"] == 200
+    assert created["data"]["enable"] == 1
+    listed = client.get("/periodic", query_string={"project": "project_0"}).get_json()["data"]
+    assert [row["id"] for row in listed] == [created["data"]["id"]]
+    assert listed[0]["settings"] == {"DOWNLOAD_DELAY": 1}
+
+
+@pytest.mark.parametrize("fields", [
+    {}, {"cron": "* * * * *", "interval": 60}, {"interval": -1}, {"cron": "bad"},
+    {"interval": 60, "enable": 2}, {"interval": 60, "enable": "yes"}, {"interval": 60, "jitter": -1},
+    {"interval": 60, "misfire_policy": "later"}, {"interval": 60, "settings": []}, {"interval": 60, "node_id": 99},
+    {"cron": 5}, {"cron": ["* * * * *"]},
+])
+def test_create_periodic_rejects_invalid_fields(client, fields):
+    assert create(client, **fields)["code"] == 400
+
+
+def test_update_switches_between_cron_and_interval(client):
+    schedule_id = create(client, interval=600)["data"]["id"]
+
+    updated = client.put(f"/periodic/{schedule_id}", json={"cron": "0 * * * *"}).get_json()
+    assert (updated["data"]["cron"], updated["data"]["interval"]) == ("0 * * * *", None)
+
+    updated = client.put(f"/periodic/{schedule_id}", json={"interval": 30}).get_json()
+    assert (updated["data"]["cron"], updated["data"]["interval"]) == (None, 30)
+
+    updated = client.put(f"/periodic/{schedule_id}", json={"enable": False}).get_json()
+    assert updated["data"]["enable"] == 0
+    assert client.put(f"/periodic/{schedule_id}", json={"enable": None}).get_json()["code"] == 400
+
+
+def test_reenabling_clears_stale_next_run_time(app, client):
+    schedule_id = create(client, interval=60, misfire_policy="catchup")["data"]["id"]
+    client.put(f"/periodic/{schedule_id}", json={"enable": False})
+    with app.app_context():
+        row = db.session.get(PeriodicScheduleModel, schedule_id)
+        row.next_run_time = 1
+        db.session.commit()
+
+    # 停用状态下修改其他字段不影响计划时间
+    assert client.put(f"/periodic/{schedule_id}", json={"jitter": 1}).get_json()["data"]["next_run_time"] == 1
+    updated = client.put(f"/periodic/{schedule_id}", json={"enable": True}).get_json()
+    assert (updated["data"]["enable"], updated["data"]["next_run_time"]) == (1, None)
+
+
+def test_delete_periodic(client):
+    schedule_id = create(client, interval=600)["data"]["id"]
+    assert client.delete(f"/periodic/{schedule_id}").get_json()["code"] == 200
+    assert client.delete(f"/periodic/{schedule_id}").get_json()["code"] == 404
+    assert client.put(f"/periodic/{schedule_id}", json={"interval": 5}).get_json()["code"] == 404
@@ -0,0 +1,114 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from app.libs.sketches import HyperLogLog, QuantileSketch, SpaceSaving, hash64
+from app.scrapyd_client.item_profile import profile_items
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+SCRIPT = """
+from app.scrapyd_client.item_profile import FieldProfile
+profile = FieldProfile(8)
+for value in ["a", "b", -1, -2, 1.5, None, [1]]:
+    profile.add(value)
+print(bytes(profile.distinct.registers).hex())
+"""
+
+
+def test_distinct_registers_do_not_depend_on_hash_seed():
+    outputs = {
+        subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True,
+                       cwd=ROOT, env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        for seed in ("1", "2")
+    }
+    assert len(outputs) == 1
+
+
+def test_hash64_separates_close_values():
+    assert hash64(b"n:-1") != hash64(b"n:-2")
+
+
+@pytest.mark.parametrize("n", [10, 1000, 50000])
+def test_hyperloglog_estimate(n):
+    hll = HyperLogLog()
+    for i in range(n):
+        hll.add(str(i).encode())
+        hll.add(str(i).encode())
+    assert abs(hll.count() - n) <= max(2, n * 0.05)
+
+
+def test_quantile_sketch_memory_is_bounded():
+    sketch = QuantileSketch(k=100, seed=1)
+    for i in range(200000):
+        sketch.add(i)
+    stored = sum(len(level) for level in sketch.levels)
+    assert stored <= 3 * 100 + 2 * len(sketch.levels)
+    # 低层容量按层数收缩
+    assert len(sketch.levels[0]) < 100
+    assert sketch.count == 200000
+
+
+def test_quantile_sketch_accuracy():
+    rng = random.Random(7)
+    values = [rng.random() for _ in range(100000)]
+    sketch = QuantileSketch(k=200, seed=3)
+    for value in values:
+        sketch.add(value)
+    ordered = sorted(values)
+    for q, estimate in zip((0.1, 0.5, 0.9, 0.99), sketch.quantiles((0.1, 0.5, 0.9, 0.99))):
+        rank = sum(1 for v in ordered if v <= estimate) / len(ordered)
+        assert abs(rank - q) < 0.02
+    assert sketch.quantiles((0, 1)) == [min(values), max(values)]
+
+
+def test_quantile_sketch_small_and_empty():
+    sketch = QuantileSketch()
+    assert sketch.quantiles((0.5,)) == [None]
+    for value in (3, 1, 2):
+        sketch.add(value)
+    assert sketch.quantiles((0.5,)) == [2]
+
+
+def test_space_saving_finds_heavy_hitters():
+    counter = SpaceSaving(capacity=50)
+    rng = random.Random(5)
+    stream = ["hot"] * 500 + ["warm"] * 200 + [f"cold{rng.randrange(10000)}" for _ in range(2000)]
+    rng.shuffle(stream)
+    for key in stream:
+        counter.add(key)
+    top = counter.top(2)
+    assert [key for key, _, _ in top] == ["hot", "warm"]
+    for key, count, error in top:
+        assert count - error <= stream.count(key) <= count
+
+
+def lines(*items):
+    return [json.dumps(item).encode() for item in items]
+
+
+def test_profile_items_counts_distinct_values_by_value():
+    report = profile_items(lines({"n": -1}, {"n": -2}, {"n": 1}, {"n": 1.0}, {"n": True}, {"n": "1"}) + [b"bad"])
+    field = report["fields"][0]
+    assert report["items"] == 6 and report["invalid_lines"] == 1
+    # -1与-2不同；1与1.0相同；True与"1"各自不同
+    assert field["distinct"] == 5
+    assert field["types"] == {"integer": 3, "float": 1, "boolean": 1, "string": 1}
+
+
+def test_profile_items_fields():
+    items = [{"url": f"https://example.com/{i}", "price": i % 10, "tags": ["a"] * (i % 3)} for i in range(100)]
+    items.append({"url": "https://example.com/extra"})
+    report = profile_items(lines(*items), top=3, max_fields=2)
+    fields = {f["field"]: f for f in report["fields"]}
+    assert set(fields) == {"url", "price"}
+    assert report["skipped_fields"] == 1
+    assert fields["url"]["presence"] == 1.0
+    assert 95 <= fields["url"]["distinct"] <= 101
+    assert fields["price"]["value"]["min"] == 0 and fields["price"]["value"]["max"] == 9
+    assert len(fields["price"]["top"]) == 3
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+from app.scrapyd_client.throughput import HEADER, RECORD, ThroughputStore, downsample, lttb, parse_logstats
+
+
+def logstats(minute: int, pages: int) -> bytes:
+    return (f"2025-01-01 00:{minute:02d}:00 [scrapy.extensions.logstats] INFO: Crawled {pages} pages "
+            f"(at 60 pages/min), scraped {pages // 2} items (at 30 items/min)\n").encode()
+
+
+LOG = b"".join(logstats(m, m * 60) + b"2025-01-01 00:00:01 [scrapy.core.engine] DEBUG: noise\n"
+               for m in range(10))
+
+
+class LogNode:
+    """按偏移返回日志的节点，可以模拟日志增长与读取失败"""
+
+    def __init__(self, log: bytes):
+        self.log = log
+        self.fail_after = None
+
+    def iter_log(self, project, spider, job_id, offset=0):
+        data = self.log[offset:]
+        for i in range(0, len(data), 100):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise ConnectionError("connection reset")
+            yield data[i:i + 100]
+
+
+def test_parse_logstats():
+    records = parse_logstats(logstats(1, 60) + b"other line\n" + logstats(2, 120))
+    assert [r[1:] for r in records] == [(60, 60, 30, 30), (120, 60, 60, 30)]
+    assert records[1][0] - records[0][0] == 60
+
+
+def test_lttb_keeps_endpoints_and_peak():
+    xs = list(range(100))
+    ys = [0] * 100
+    ys[37] = 1000
+    selected = lttb(xs, ys, 10)
+    assert len(selected) == 10
+    assert selected[0] == 0 and selected[-1] == 99
+    assert 37 in selected
+    assert selected == sorted(selected)
+    assert lttb(xs[:5], ys[:5], 10) == [0, 1, 2, 3, 4]
+
+
+def test_incremental_update(tmp_path):
+    store = ThroughputStore(str(tmp_path))
+    node = LogNode(LOG[:len(LOG) // 2 + 7])
+    assert store.update(node, "p", "s", "j") is False
+    partial = len(store.load("p", "s", "j")["time"])
+
+    node.log = LOG
+    assert store.update(node, "p", "s", "j", finished=True) is True
+    series = store.load("p", "s", "j")
+    assert len(series["time"]) == 10 > partial
+    assert list(series["pages"]) == [m * 60 for m in range(10)]
+    assert store.is_finished("p", "s", "j")
+    # 封存后不再读取日志
+    node.fail_after = 0
+    assert store.update(node, "p", "s", "j") is True
+
+
+def test_failed_update_does_not_duplicate_records(tmp_path):
+    store = ThroughputStore(str(tmp_path))
+    node = LogNode(LOG)
+    store.update(node, "p", "s", "j")
+    path = store.path("p", "s", "j")
+    # 模拟追加记录后、写入头部前进程退出
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(1, 2, 3, 4, 5) * 3)
+    assert len(store.load("p", "s", "j")["time"]) == 10
+
+    store.update(node, "p", "s", "j", finished=True)
+    assert list(store.load("p", "s", "j")["pages"]) == [m * 60 for m in range(10)]
+    assert os.path.getsize(path) == HEADER.size + 10 * RECORD.size
+
+
+def test_read_failure_keeps_previous_state(tmp_path):
+    store = ThroughputStore(str(tmp_path))
+    node = LogNode(LOG)
+    node.fail_after = 300
+    with pytest.raises(ConnectionError):
+        store.update(node, "p", "s", "j")
+    node.fail_after = None
+    store.update(node, "p", "s", "j", finished=True)
+    assert len(store.load("p", "s", "j")["time"]) == 10
+
+
+def test_unknown_files_are_reparsed(tmp_path):
+    store = ThroughputStore(str(tmp_path))
+    path = store.path("p", "s", "j")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"WSTPUT01" + b"\0" * 40)
+    assert store.load("p", "s", "j") is None
+    store.update(LogNode(LOG), "p", "s", "j", finished=True)
+    assert len(store.load("p", "s", "j")["time"]) == 10
+
+
+def test_downsample_uses_shared_indexes(tmp_path):
+    store = ThroughputStore(str(tmp_path))
+    store.update(LogNode(LOG), "p", "s", "j", finished=True)
+    points = downsample(store.load("p", "s", "j"), 4, "pages")
+    assert set(points) == {"time", "pages", "pages_per_min", "items", "items_per_min"}
+    assert all(len(column) == 4 for column in points.values())
+
+
+def test_throughput_endpoint(client, scrapyd):
+    jobs = scrapyd.data.jobs("project_0")
+    finished, pending = jobs["finished"][0], jobs["pending"][0]
+    args = {"project": "project_0", "spider": finished["spider"], "job_id": finished["id"], "points": 5}
+    data = client.get("/job/throughput", query_string=args).get_json()["data"]
+    assert data["finished"] is True
+    assert len(data["series"]["time"]) == min(5, data["total"])
+
+    assert client.get("/job/throughput", query_string={**args, "metric": "bogus"}).get_json()["code"] == 400
+    missing = {**args, "spider": pending["spider"], "job_id": pending["id"]}
+    assert client.get("/job/throughput", query_string=missing).get_json()["code"] == 404